@@ -0,0 +1,86 @@
+import os
+import pygame
+
+# Every image that has been loaded, maps (path, scale) -> Surface
+# scale is either a scale factor or an exact [width, height] size, stored as a tuple
+IMAGES = {}
+STATS = {'hits': 0, 'misses': 0}  # Counts of images served from IMAGES and images that had to be created
+
+# Scaled images the game uses on top of the unscaled sheets, preloaded along with the Sprites folder
+MANIFEST = [
+    (('Sprites', 'Environment', 'Floor.png'), (1680, 1050)),
+    (('Sprites', 'Environment', 'Obstacles', 'Barrel.png'), 2),
+]
+
+
+def load_image(*path, scale=1) -> pygame.Surface:
+    """
+    Function that loads an image once per process and returns the same Surface every time after that
+    Images are converted to the display's pixel format if there is a display to convert to
+    The returned Surface is shared, so it must not be drawn on
+    :param path: The parts of the file path, as given to os.path.join
+    :param scale: Either a scale factor or an exact [width, height] to scale the image to
+    :return: The loaded image
+    """
+    if isinstance(scale, list):
+        scale = tuple(scale)  # Lists can't be used as dictionary keys
+    key = (os.path.join(*path), scale)
+
+    image = IMAGES.get(key)
+    if image is not None:
+        STATS['hits'] += 1
+        return image
+
+    STATS['misses'] += 1
+    if scale == 1:
+        image = pygame.image.load(key[0])
+        if pygame.display.get_surface() is not None:
+            image = image.convert_alpha()
+    else:
+        original = load_image(*path)  # Scaled copies share the decoded original
+        if isinstance(scale, tuple):
+            image = pygame.transform.scale(original, scale)
+        else:
+            image = pygame.transform.scale_by(original, scale)
+
+    IMAGES[key] = image
+    return image
+
+
+def preload(manifest=None) -> int:
+    """
+    Loads every image in the Sprites folder and every scaled image in the manifest ahead of time
+    :param manifest: List of (path parts, scale), defaults to MANIFEST
+    :return: The number of images that weren't already loaded
+    """
+    misses = STATS['misses']
+    for folder, _, files in os.walk('Sprites'):
+        for file in sorted(files):
+            if file.lower().endswith('.png'):
+                load_image(folder, file)
+
+    for path, scale in MANIFEST if manifest is None else manifest:
+        load_image(*path, scale=scale)
+
+    return STATS['misses'] - misses
+
+
+def get_stats() -> dict:
+    """
+    :return: The cache hits and misses, the number of images held and the bytes of pixel data they take up
+    """
+    return {
+        'hits': STATS['hits'],
+        'misses': STATS['misses'],
+        'images': len(IMAGES),
+        'bytes': sum(image.get_pitch() * image.get_height() for image in IMAGES.values()),
+    }
+
+
+def clear():
+    """
+    Forgets every loaded image, e.g. after the display mode changes
+    """
+    IMAGES.clear()
+    STATS['hits'] = 0
+    STATS['misses'] = 0
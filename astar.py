@@ -1,41 +1,18 @@
+import heapq
 import rooms
 
+DIAGONAL_COST = 2 ** 0.5  # Cost of moving diagonally between Tiles, straight moves cost 1
+# All 8 directions a Tile can be left in, as (column offset, row offset, cost)
+NEIGHBOURS = (
+    (-1, -1, DIAGONAL_COST), (-1, 0, 1), (-1, 1, DIAGONAL_COST),
+    (0, -1, 1), (0, 1, 1),
+    (1, -1, DIAGONAL_COST), (1, 0, 1), (1, 1, DIAGONAL_COST),
+)
 
-class Node:
-    def __init__(self, parent, coords: list, h: int):
-        """
-        Class to act as Tile proxy in the A* algorithm
-        :param parent: The parent node, used to trace the path backwards
-        :param coords: The [column, row] of the corresponding Tile
-        :param h: The heuristic value, manhattan distance from the destination Tile
-        """
-        self.parent = parent
-        self.coords = coords
-        self.h = h
-
-    def get_coords(self) -> list:
-        """
-        :return: The coordinates of the corresponding Tile as [column, row]
-        """
-        return [self.coords[0], self.coords[1]]
-
-    def get_tile(self):
-        """
-        :return: The corresponding Tile
-        """
-        return rooms.TILES[self.coords[0]][self.coords[1]]
-
-    def get_h(self) -> int:
-        """
-        :return: The heuristic value, manhattan distance to the end
-        """
-        return self.h
-
-    def get_parent(self):
-        """
-        :return: The parent node
-        """
-        return self.parent
+MAX_PATHS = 256  # Most paths kept by get_path, the least recently used is dropped first
+# Maps (start coords, end coords, rooms.LAYOUT_VERSION) to the path, ordered from least to most recently used
+PATHS = {}
+STATS = {'hits': 0, 'misses': 0, 'expanded': 0}  # 'expanded' counts the nodes every search has taken off its heap
 
 
 def manhattan(start, end) -> int:
@@ -52,48 +29,265 @@ def manhattan(start, end) -> int:
     return dist_x + dist_y
 
 
+def octile(start: tuple, end: tuple) -> float:
+    """
+    Function that finds the octile distance between two map coordinates
+    Octile distance is the cost of the shortest path on an empty 8-connected grid
+    :param start: First coordinate as (column, row)
+    :param end: Second coordinate as (column, row)
+    :return: Distance between the coordinates, in Tiles
+    """
+    dist_x = abs(end[0] - start[0])
+    dist_y = abs(end[1] - start[1])
+
+    return dist_x + dist_y + (DIAGONAL_COST - 2) * min(dist_x, dist_y)
+
+
 def astar(start, end) -> list:
     """
-    Function for finding the best path between two Tiles, avoiding obstacles
-    Not necessarily fastest as it uses heuristics, but close enough
+    Function for finding the shortest path between two Tiles, avoiding obstacles
+    Uses a binary heap for the open set and the octile distance as the heuristic
+    Only searches chunks that are loaded, so a search can never load the whole Room
     :param start: Start Tile
     :param end: Destination Tile
-    :return: A list of all the Tiles along the path, in order from end to start as a list of Tiles
-    """
-    currentNode = Node(None, start.get_map_coords(), 999)
-    openList = [currentNode]  # List of all nodes for tiles that have been 'looked at' but not visited
-    closedList = []  # List of all coordinates of Tiles that have been visited already
-
-    while currentNode.get_coords() != end.get_map_coords():
-        # Moves current node from the openList to the closedList
-        openList.remove(currentNode)
-        closedList.append(currentNode.get_coords())
-
-        # Checks all Tiles surrounding the current node's Tile
-        for tile in rooms.get_surrounding(currentNode.get_tile()):
-            if tile.get_map_coords() not in closedList:
-                if not any(tile.get_map_coords() == node.get_coords() for node in openList):
-                    # Checks if the tile has not already been asigned a node
-                    openList.append(Node(currentNode, tile.get_map_coords(), manhattan(end, tile)))
-
-        # Returns the start node if the destination is within the surrounding tiles to avoid bugs
-        if len(openList) == 0:
-            return [start]
-
-        # Changes currentNode to node from the openList with lowest h value
-        currentNode = openList[-1]
-        for node in openList:
-            if node.get_h() < currentNode.get_h():
-                currentNode = node
-
-    # Forms the path by adding all the parents of the nodes
-    path = [end]
-    while currentNode.get_parent() is not None:
-        path.append(rooms.TILES[currentNode.get_parent().get_coords()[0]][currentNode.get_parent().get_coords()[1]])
-        currentNode = currentNode.get_parent()
-
-    # Delets all nodes used to save memory
-    for _ in openList:
-        del _
-
-    return path
+    :return: A list of all the Tiles along the path, in order from end to start
+    Empty list if there is no path between the Tiles
+    """
+    get_occupied = rooms.TILES.get_occupied
+    start_coords = (start.get_column(), start.get_row())
+    end_coords = (end.get_column(), end.get_row())
+
+    g_costs = {start_coords: 0}  # Cheapest known cost from the start to each coordinate
+    parents = {}  # The coordinate each coordinate was reached from, used to trace the path backwards
+    closed = set()  # All coordinates that have been visited already
+    # Heap entries are (f, h, coords) so ties on f are broken towards the destination
+    h = octile(start_coords, end_coords)
+    open_heap = [(h, h, start_coords)]
+
+    while open_heap:
+        _, _, current = heapq.heappop(open_heap)
+        if current in closed:
+            continue  # Stale entry left behind when a cheaper route to the coordinate was found
+
+        if current == end_coords:
+            # Forms the path by following the parents back to the start
+            STATS['expanded'] += len(closed) + 1
+            path = [end]
+            while current in parents:
+                current = parents[current]
+                path.append(rooms.TILES.get_loaded(*current))
+            return path
+
+        closed.add(current)
+        g = g_costs[current]
+
+        for dx, dy, cost in NEIGHBOURS:
+            column = current[0] + dx
+            row = current[1] + dy
+            coords = (column, row)
+            if coords in closed:
+                continue
+            occupied = get_occupied(column, row)  # Read from the chunk's arrays, no Tile object is made
+            if occupied is None:
+                continue  # Outside the Room or not loaded
+            if occupied and coords != end_coords:
+                continue
+
+            new_g = g + cost
+            if new_g < g_costs.get(coords, float('inf')):
+                g_costs[coords] = new_g
+                parents[coords] = current
+                h = octile(coords, end_coords)
+                heapq.heappush(open_heap, (new_g + h, h, coords))
+
+    STATS['expanded'] += len(closed)
+    return []  # Every reachable Tile was visited without finding the destination
+
+
+def sign(value: int) -> int:
+    """
+    :param value: Any number
+    :return: -1, 0 or 1 depending on if the number is negative, zero or positive
+    """
+    return (value > 0) - (value < 0)
+
+
+def jps(start, end) -> list:
+    """
+    Jump Point Search, finds the same length of path as astar but only puts the Tiles where the path
+    has to turn onto the heap, scanning along straight and diagonal lines of free Tiles in between
+    This expands far fewer nodes than astar across large open Rooms
+    Moves follow the same rules as astar, so diagonal moves can cut past the corners of obstacles
+    The scans read the World's grid, where each Tile is one index and moving is adding a step to it
+    :param start: Start Tile
+    :param end: Destination Tile
+    :return: A list of all the Tiles along the path, in order from end to start
+    Empty list if there is no path between the Tiles
+    """
+    if rooms.TILES.get_occupied(start.get_column(), start.get_row()) is None or \
+            rooms.TILES.get_occupied(end.get_column(), end.get_row()) is None:
+        return astar(start, end)  # Tiles that aren't loaded aren't in the grid, astar handles them already
+    grid, left, top, height = rooms.TILES.get_grid()
+    start_index = (start.get_column() - left) * height + start.get_row() - top
+    end_index = (end.get_column() - left) * height + end.get_row() - top
+
+    def jump(index: int, dx: int, dy: int):
+        """
+        Scans from a Tile in one direction until it finds a Tile the path might have to turn at
+        :return: The grid index of the jump point, None if the scan hits an obstacle first
+        """
+        across = dx * height  # Grid step for one column, a row is a step of 1
+        step = across + dy
+        while not grid[index]:
+            if index == end_index:
+                return index
+            if dx and dy:
+                # Diagonal scans stop where an obstacle behind them opens up a new direction,
+                # or where a straight scan branching off them finds a jump point
+                if (grid[index - across] and not grid[index - across + dy]) or \
+                        (grid[index - dy] and not grid[index + across - dy]):
+                    return index
+                if jump(index + across, dx, 0) is not None or jump(index + dy, 0, dy) is not None:
+                    return index
+            elif dx:
+                if (grid[index + 1] and not grid[index + step + 1]) or (grid[index - 1] and not grid[index + step - 1]):
+                    return index
+            elif (grid[index + height] and not grid[index + height + dy]) or \
+                    (grid[index - height] and not grid[index - height + dy]):
+                return index
+            index += step
+        return None
+
+    def directions(index: int) -> list:
+        """
+        :return: The (dx, dy) directions worth scanning in from a jump point, given the direction it was reached in
+        """
+        if index not in parents:
+            return [(dx, dy) for dx, dy, _ in NEIGHBOURS]
+        column, row = divmod(index, height)
+        parent_column, parent_row = divmod(parents[index], height)
+        dx = sign(column - parent_column)
+        dy = sign(row - parent_row)
+        across = dx * height
+        if dx and dy:
+            found = [(dx, dy), (dx, 0), (0, dy)]
+            if grid[index - across]:
+                found.append((-dx, dy))
+            if grid[index - dy]:
+                found.append((dx, -dy))
+        elif dx:
+            found = [(dx, 0)]
+            if grid[index + 1]:
+                found.append((dx, 1))
+            if grid[index - 1]:
+                found.append((dx, -1))
+        else:
+            found = [(0, dy)]
+            if grid[index + height]:
+                found.append((1, dy))
+            if grid[index - height]:
+                found.append((-1, dy))
+        return found
+
+    end_coords = divmod(end_index, height)
+    g_costs = {start_index: 0}
+    parents = {}
+    closed = set()
+    h = octile(divmod(start_index, height), end_coords)
+    open_heap = [(h, h, start_index)]
+
+    # The destination can be entered even if it is occupied, the same as in astar
+    blocked = grid[end_index]
+    grid[end_index] = 0
+    try:
+        while open_heap:
+            _, _, current = heapq.heappop(open_heap)
+            if current in closed:
+                continue
+
+            if current == end_index:
+                STATS['expanded'] += len(closed) + 1
+                # Jump points can be many Tiles apart, so the Tiles in between are filled back in
+                path = [end]
+                column, row = divmod(current, height)
+                while current in parents:
+                    current = parents[current]
+                    parent_column, parent_row = divmod(current, height)
+                    dx = sign(parent_column - column)
+                    dy = sign(parent_row - row)
+                    while (column, row) != (parent_column, parent_row):
+                        column += dx
+                        row += dy
+                        path.append(rooms.TILES.get_loaded(column + left, row + top))
+                return path
+
+            closed.add(current)
+            g = g_costs[current]
+            coords = divmod(current, height)
+
+            for dx, dy in directions(current):
+                found = jump(current + dx * height + dy, dx, dy)
+                if found is None or found in closed:
+                    continue
+                found_coords = divmod(found, height)
+                new_g = g + octile(coords, found_coords)  # Jump points are joined by straight or diagonal lines
+                if new_g < g_costs.get(found, float('inf')):
+                    g_costs[found] = new_g
+                    parents[found] = current
+                    h = octile(found_coords, end_coords)
+                    heapq.heappush(open_heap, (new_g + h, h, found))
+    finally:
+        grid[end_index] = blocked
+
+    STATS['expanded'] += len(closed)
+    return []
+
+
+SEARCHES = {'astar': astar, 'jps': jps}  # The searches get_path can use, they all return paths in the same format
+SEARCH = 'astar'  # The search get_path uses
+
+
+def get_path(start, end) -> list:
+    """
+    Cached version of the search chosen by SEARCH, Enemies on nearby Tiles chasing the Player ask for the same paths every frame
+    Paths are keyed by rooms.LAYOUT_VERSION, so they are thrown away as soon as any obstacle changes
+    :param start: Start Tile
+    :param end: Destination Tile
+    :return: A list of all the Tiles along the path, in order from end to start
+    Empty list if there is no path between the Tiles
+    """
+    key = ((start.get_column(), start.get_row()), (end.get_column(), end.get_row()), rooms.LAYOUT_VERSION)
+    path = PATHS.pop(key, None)
+    if path is not None:
+        STATS['hits'] += 1
+    else:
+        STATS['misses'] += 1
+        if PATHS and next(iter(PATHS))[2] != rooms.LAYOUT_VERSION:
+            PATHS.clear()  # Every path was found for an old layout, so none of them can be used again
+        elif len(PATHS) >= MAX_PATHS:
+            del PATHS[next(iter(PATHS))]
+        path = SEARCHES[SEARCH](start, end)
+    PATHS[key] = path  # Re-inserting moves the path to the most recently used end
+    return path[:]  # Copied so callers can't change the cached path
+
+
+def get_stats() -> dict:
+    """
+    :return: The path cache hits and misses, the number of paths held and the nodes expanded by searches
+    """
+    return {
+        'hits': STATS['hits'],
+        'misses': STATS['misses'],
+        'paths': len(PATHS),
+        'expanded': STATS['expanded'],
+    }
+
+
+def clear():
+    """
+    Forgets every cached path and resets the counters
+    """
+    PATHS.clear()
+    STATS['hits'] = 0
+    STATS['misses'] = 0
+    STATS['expanded'] = 0
@@ -0,0 +1,167 @@
+import os
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import numpy as np
+
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')  # Otherwise every worker prints it
+
+import headless  # Sets up headless mode, so must be imported before the other game modules
+import system
+import astar
+import rooms
+
+# The columns of the results file, one row for every Room played, with the type each is stored as
+COLUMNS = {
+    'seed': np.int64,  # The run's seed, rows with the same seed are the Rooms of one run in order
+    'room': np.int32,  # How many Rooms were cleared in the run before this one
+    'difficulty': np.float64,
+    'ticks': np.int32,  # Ticks spent in the Room, the time to clear it if it was cleared
+    'damage': np.int32,  # Health the Player lost in the Room
+    'gold': np.int32,  # Gold picked up in the Room
+    'cleared': np.bool_,  # If the Player left through the Door
+    'died': np.bool_,  # If the run ended with the Player dying in this Room, its room column is the death depth
+}
+MAX_TICKS = 20000  # Most ticks each run is played for, the last Room of a run that reaches it is neither cleared nor died in
+MAX_ROOM_TICKS = 2000  # Runs that spend this long in one Room are ended, the ScriptedPlayer is stuck rather than playing
+GAME = None  # Each worker process's System, made once by start_worker() and reused for every run
+START = None  # The Player's state when the worker started, every run starts from it so runs are comparable
+
+
+def start_worker(room_size, search: str, difficulty_step: float, trap_damage: int, scale_enemies: bool):
+    """
+    Sets up a worker process, run once in each process before it plays any runs
+    :param room_size: The number of (columns, rows) of Tiles in every Room, None for one screen
+    :param search: Key of astar.SEARCHES for the ScriptedPlayer to use
+    :param difficulty_step: Value for rooms.DIFFICULTY_STEP
+    :param trap_damage: Value for rooms.TRAP_DAMAGE
+    :param scale_enemies: Value for rooms.SCALE_ENEMIES
+    """
+    global GAME, START
+    astar.SEARCH = search
+    rooms.DIFFICULTY_STEP = difficulty_step
+    rooms.TRAP_DAMAGE = trap_damage
+    rooms.SCALE_ENEMIES = scale_enemies
+    GAME = system.System(room_size=room_size)
+    START = system.PLAYER.get_state()
+
+
+def play(seed: int, max_ticks=MAX_TICKS) -> dict:
+    """
+    Plays one seeded run with the ScriptedPlayer in a worker process
+    :param seed: Seed for the run
+    :param max_ticks: Most ticks to play for
+    :return: Maps each of COLUMNS to a list of values, one for each Room played
+    """
+    rows = {name: [] for name in COLUMNS}
+    system.PLAYER.set_state(START)
+    system.STATE = 'game_running'
+    GAME.new_run(seed)
+    policy = headless.ScriptedPlayer()
+
+    def finish_room(room, cleared):
+        rows['seed'].append(seed)
+        rows['room'].append(len(rows['seed']) - 1)
+        rows['difficulty'].append(room.difficulty)
+        rows['ticks'].append(ticks)
+        rows['damage'].append(damage)
+        rows['gold'].append(system.PLAYER.get_gold() - gold)
+        rows['cleared'].append(cleared)
+        rows['died'].append(system.PLAYER.is_dead())
+
+    ticks = damage = 0
+    gold = system.PLAYER.get_gold()
+    for _ in range(max_ticks):
+        room = GAME.current_room
+        health = system.PLAYER.current_health
+        GAME.step(policy.get_keys(room))
+        ticks += 1
+        if GAME.current_room is not room:
+            # The Player is healed on the way into the next Room, and nothing can hurt them on the Door anyway
+            finish_room(room, True)
+            ticks = damage = 0
+            gold = system.PLAYER.get_gold()
+            continue
+        damage += max(health - system.PLAYER.current_health, 0)
+        if system.STATE != 'game_running' or ticks >= MAX_ROOM_TICKS:
+            break
+        if policy.wants_attack(room):
+            GAME.attack()
+    finish_room(GAME.current_room, False)
+    return rows
+
+
+def simulate(runs: int, first_seed=0, workers=None, room_size=None, search=astar.SEARCH, max_ticks=MAX_TICKS,
+             difficulty_step=rooms.DIFFICULTY_STEP, trap_damage=rooms.TRAP_DAMAGE,
+             scale_enemies=rooms.SCALE_ENEMIES) -> dict:
+    """
+    Plays many seeded runs in parallel, one worker process per core
+    :param runs: Number of runs to play, with the seeds first_seed, first_seed + 1 and so on
+    :param first_seed: Seed of the first run
+    :param workers: Number of processes, defaults to one per core
+    :param room_size: The number of (columns, rows) of Tiles in every Room, defaults to one screen
+    :param search: Key of astar.SEARCHES for the ScriptedPlayer to use
+    :param max_ticks: Most ticks each run is played for
+    :param difficulty_step: Difficulty added for each Room cleared
+    :param trap_damage: Damage a Trap does at difficulty 1
+    :param scale_enemies: If Enemies' health, damage and loot scale with the Room's difficulty
+    :return: Maps each of COLUMNS to a numpy array, one row for every Room played
+    """
+    workers = workers or os.cpu_count()
+    seeds = range(first_seed, first_seed + runs)
+    chunksize = max(1, runs // (workers * 8))  # Big enough to keep the overhead down, small enough to share out evenly
+    # Workers are started fresh instead of forked, as this process already has pygame and the Layout thread running
+    with ProcessPoolExecutor(workers, multiprocessing.get_context('spawn'), start_worker,
+                             (room_size, search, difficulty_step, trap_damage, scale_enemies)) as executor:
+        results = list(executor.map(play, seeds, [max_ticks] * runs, chunksize=chunksize))
+    return {name: np.array([value for rows in results for value in rows[name]], dtype)
+            for name, dtype in COLUMNS.items()}
+
+
+def summarise(columns: dict) -> list:
+    """
+    :param columns: Results from simulate()
+    :return: Lines of text giving the statistics for each difficulty
+    """
+    lines = ['{:>10} {:>7} {:>8} {:>10} {:>8} {:>6} {:>7}'.format(
+        'difficulty', 'rooms', 'cleared', 'clear_tick', 'damage', 'gold', 'deaths')]
+    for difficulty in np.unique(columns['difficulty']):
+        rows = columns['difficulty'] == difficulty
+        cleared = rows & columns['cleared']
+        lines.append('{:>10} {:>7} {:>8.0%} {:>10.0f} {:>8.1f} {:>6.1f} {:>7}'.format(
+            difficulty, rows.sum(), cleared.sum() / rows.sum(),
+            columns['ticks'][cleared].mean() if cleared.any() else float('nan'),
+            columns['damage'][rows].mean(), columns['gold'][rows].mean(), columns['died'][rows].sum()))
+    deaths = columns['room'][columns['died']]
+    lines.append('runs: {}, deaths: {}, mean death depth: {:.2f} rooms'.format(
+        len(np.unique(columns['seed'])), len(deaths), deaths.mean() if len(deaths) else float('nan')))
+    return lines
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Plays many seeded runs in parallel to measure the difficulty balance')
+    parser.add_argument('--runs', type=int, default=1000, help='number of runs to play')
+    parser.add_argument('--first-seed', type=int, default=0, help='seed of the first run, the rest follow on from it')
+    parser.add_argument('--workers', type=int, help='number of processes, one per core by default')
+    parser.add_argument('--size', type=int, nargs=2, metavar=('COLUMNS', 'ROWS'), help='size of every Room in Tiles')
+    parser.add_argument('--search', choices=sorted(astar.SEARCHES), default=astar.SEARCH, help='pathfinding search to use')
+    parser.add_argument('--max-ticks', type=int, default=MAX_TICKS, help='most ticks to play each run for')
+    parser.add_argument('--difficulty-step', type=float, default=rooms.DIFFICULTY_STEP,
+                        help='difficulty added for each room cleared')
+    parser.add_argument('--trap-damage', type=int, default=rooms.TRAP_DAMAGE, help='damage a trap does at difficulty 1')
+    parser.add_argument('--scale-enemies', action='store_true',
+                        help="scale enemies' health, damage and loot with the room's difficulty")
+    parser.add_argument('--output', default='batch.npz', help='file to save the results to, one numpy array per column')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = simulate(args.runs, args.first_seed, args.workers, args.size and tuple(args.size), args.search,
+                       args.max_ticks, args.difficulty_step, args.trap_damage, args.scale_enemies)
+    seconds = time.perf_counter() - start
+    np.savez_compressed(args.output, **results)
+
+    for line in summarise(results):
+        print(line)
+    print('{} runs and {} ticks in {:.1f}s, {:.0f} ticks per second, saved to {}'.format(
+        args.runs, results['ticks'].sum(), seconds, results['ticks'].sum() / seconds, args.output))
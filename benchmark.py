@@ -0,0 +1,249 @@
+import argparse
+import json
+import os
+import platform
+import random
+import time
+
+import headless  # Sets up headless mode, so must be imported before the other game modules
+import system
+import pygame
+import astar
+import map
+import rooms
+import creatures
+import replay
+
+SEED = 1234  # Every benchmark reseeds random with this so each run times the same work
+REPEATS = 5  # Each benchmark is timed this many times and the fastest is kept
+
+
+def best_time(setup, run, number: int) -> float:
+    """
+    Times a piece of code, keeping the fastest of REPEATS runs to cut out noise from other processes
+    :param setup: Function called before each timed run, its return value is passed to run
+    :param run: Function being timed, called number times in a row
+    :param number: How many calls to time together
+    :return: The fastest time for a single call, in seconds
+    """
+    best = float('inf')
+    for _ in range(REPEATS):
+        random.seed(SEED)
+        state = setup()
+        start = time.perf_counter()
+        for _ in range(number):
+            run(state)
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def make_room(enemies=None) -> rooms.Room:
+    """
+    :param enemies: If given, Slimes are added to or removed from the Room until there are this many
+    :return: A Room of difficulty 1, the same one for a given random seed
+    """
+    room = rooms.Room(1)
+    if enemies is not None:
+        room.swarm.truncate(enemies)
+        free = free_tiles()
+        while room.swarm.count < enemies:
+            tile = random.choice(free)
+            creatures.Factory('Slime', room.swarm, tile.get_center('x'), tile.get_center('y'), 1)
+    system.PLAYER.get_hitbox().topleft = (70, 70)
+    system.PLAYER.heal(999)
+    return room
+
+
+def free_tiles() -> list:
+    """
+    :return: Every loaded Tile in the current Room that isn't occupied
+    """
+    return [tile for tile in rooms.TILES.get_loaded_tiles() if not tile.return_occupied()]
+
+
+def bench_search_typical(search):
+    def bench() -> float:
+        def setup():
+            make_room()
+            tiles = free_tiles()
+            return [(random.choice(tiles), random.choice(tiles)) for _ in range(50)]
+
+        def run(pairs):
+            for start, end in pairs:
+                search(start, end)
+
+        return best_time(setup, run, 1) / 50
+    return bench
+
+
+def bench_astar_cached() -> float:
+    def setup():
+        make_room()
+        astar.clear()
+        tiles = free_tiles()
+        pairs = [(random.choice(tiles), random.choice(tiles)) for _ in range(50)]
+        for start, end in pairs:
+            astar.get_path(start, end)  # Fills the cache, what's being measured is a hit
+        return pairs
+
+    def run(pairs):
+        for start, end in pairs:
+            astar.get_path(start, end)
+
+    return best_time(setup, run, 1) / 50
+
+
+def bench_search_unreachable(search):
+    def bench() -> float:
+        def setup():
+            make_room()
+            # Walls off the bottom right corner so every other free Tile is searched before giving up
+            goal = rooms.TILES.get_tile(rooms.TILES.columns - 1, rooms.TILES.rows - 1)
+            goal.set_occupied(False)
+            for tile in rooms.get_surrounding(goal):
+                tile.set_occupied(True)
+            start = rooms.TILES.get_tile(0, 0)
+            return start if not start.return_occupied() else free_tiles()[0], goal
+
+        def run(state):
+            search(*state)
+
+        return best_time(setup, run, 10)
+    return bench
+
+
+def bench_generate_map() -> float:
+    return best_time(lambda: None, lambda _: map.generate_map(), 20)
+
+
+def bench_room() -> float:
+    return best_time(lambda: None, lambda _: rooms.Room(1), 20)
+
+
+def bench_get_image() -> float:
+    def setup():
+        sheet = system.PLAYER.spritesheets['run_right']
+        sheet.get_image()  # Frames are cut on first use, that cost isn't what's being measured
+        return sheet
+
+    def run(sheet):
+        sheet.update()
+        sheet.get_image()
+
+    return best_time(setup, run, 1000)
+
+
+def bench_get_tile() -> float:
+    def setup():
+        room = make_room()
+        return room.get_enemies()[0], free_tiles()
+
+    def run(state):
+        # Moves the Enemy to a new Tile each call so the lookup can't come from the cache
+        enemy, tiles = state
+        for tile in tiles:
+            enemy.set_center(tile.get_center('x'), tile.get_center('y'))
+            enemy.get_tile()
+
+    return best_time(setup, run, 1) / len(free_tiles())
+
+
+def bench_frame(enemies: int):
+    def bench() -> float:
+        def setup():
+            game = system.System()
+            game.current_room = make_room(enemies)
+            return game
+
+        def run(game):
+            system.PLAYER.heal(999)  # Keeps the Player alive so every frame does the same kind of work
+            game.step(headless.ScriptedKeys())
+
+        return best_time(setup, run, 20)
+    return bench
+
+
+def bench_replay(path: str):
+    def bench() -> float:
+        ticks = len(replay.load(path)['keys'])
+
+        def run(_):
+            if not headless.play_back(path)['matches']:
+                raise SystemExit('{} no longer plays out the way it was recorded'.format(path))
+
+        return best_time(lambda: None, run, 1) / ticks  # Time per tick, so recordings of any length compare
+    return bench
+
+
+BENCHMARKS = {
+    'astar_typical': bench_search_typical(astar.astar),
+    'astar_cached': bench_astar_cached,
+    'astar_unreachable': bench_search_unreachable(astar.astar),
+    'jps_typical': bench_search_typical(astar.jps),
+    'jps_unreachable': bench_search_unreachable(astar.jps),
+    'generate_map': bench_generate_map,
+    'room': bench_room,
+    'spritesheet_get_image': bench_get_image,
+    'creature_get_tile': bench_get_tile,
+    'frame_12_enemies': bench_frame(12),
+    'frame_100_enemies': bench_frame(100),
+    'frame_500_enemies': bench_frame(500),
+}
+
+
+def run_benchmarks(names=None) -> dict:
+    """
+    :param names: The names of the benchmarks to run, defaults to all of BENCHMARKS
+    :return: Maps each benchmark name to the seconds taken per call
+    """
+    return {name: BENCHMARKS[name]() for name in (names or BENCHMARKS)}
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """
+    :param results: Results from this run
+    :param baseline: Results from a saved run
+    :param threshold: How much slower a benchmark can get before it counts as a regression, 0.1 is 10%
+    :return: List of (name, baseline seconds, new seconds) for every benchmark that regressed
+    """
+    regressions = []
+    for name, seconds in results.items():
+        if name in baseline and seconds > baseline[name] * (1 + threshold):
+            regressions.append((name, baseline[name], seconds))
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Times the hot paths of the game and compares against a baseline')
+    parser.add_argument('names', nargs='*', help='benchmarks to run, all of them if none are given')
+    parser.add_argument('--output', default='benchmark.json', help='file to save the results to as JSON')
+    parser.add_argument('--baseline', help='JSON file from an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.1, help='slowdown allowed before flagging, 0.1 is 10%%')
+    parser.add_argument('--recording', action='append', default=[], metavar='FILE',
+                        help='recorded run to replay as a benchmark, can be given more than once')
+    args = parser.parse_args()
+    for path in args.recording:
+        name = 'replay_' + os.path.splitext(os.path.basename(path))[0]
+        BENCHMARKS[name] = bench_replay(path)
+        if args.names:
+            args.names.append(name)
+
+    results = run_benchmarks(args.names)
+    for name, seconds in results.items():
+        print('{:<24} {:>12.6f} ms'.format(name, seconds * 1000))
+
+    with open(args.output, 'w') as file:
+        json.dump({
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'python': platform.python_version(),
+            'pygame': pygame.version.ver,
+            'results': results,
+        }, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file)['results'], args.threshold)
+        for name, old, new in regressions:
+            print('REGRESSION {}: {:.6f} ms -> {:.6f} ms'.format(name, old * 1000, new * 1000))
+        if regressions:
+            raise SystemExit(1)
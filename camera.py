@@ -0,0 +1,51 @@
+import pygame
+
+
+class Camera:
+    def __init__(self, view_size, world_size):
+        """
+        Class for the part of a Room that is on screen, which scrolls to follow the Player
+        Everything in a Room is positioned in world pixels and moved by the Camera when it is drawn
+        :param view_size: The (width, height) of the screen in pixels
+        :param world_size: The (width, height) of the Room in pixels
+        """
+        self.rect = pygame.Rect((0, 0), view_size)  # The area of the Room that is on screen
+        self.world = pygame.Rect((0, 0), world_size)
+        self.moved = True  # If the view has moved since the last frame, so the whole screen needs redrawing
+
+    def follow(self, x: int, y: int):
+        """
+        Centres the view on a point without showing anything past the edges of the Room
+        If the Room is smaller than the screen it is centred on the screen instead
+        :param x: x-coord to centre on
+        :param y: y-coord to centre on
+        """
+        old = self.rect.topleft
+        self.rect.center = (x, y)
+        self.rect.clamp_ip(self.world)
+        self.moved = self.rect.topleft != old
+
+    def get_rect(self) -> pygame.Rect:
+        """
+        :return: The area of the Room that is on screen, in world pixels
+        """
+        return self.rect
+
+    def get_offset(self) -> tuple:
+        """
+        :return: The (x, y) to move world coordinates by to get screen coordinates
+        """
+        return -self.rect.x, -self.rect.y
+
+    def to_screen(self, rect: pygame.Rect) -> pygame.Rect:
+        """
+        :param rect: A rectangle in world pixels
+        :return: The same rectangle in screen pixels
+        """
+        return rect.move(-self.rect.x, -self.rect.y)
+
+    def has_moved(self) -> bool:
+        """
+        :return: If the view moved the last time follow() was called
+        """
+        return self.moved
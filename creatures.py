@@ -1,10 +1,8 @@
 import pygame
-import os
-import random
+import weakref
+import assets
 import rooms
-import astar
-import system
-import items
+import swarm
 
 
 def Factory(enemy, *args) -> object:
@@ -15,11 +13,13 @@ def Factory(enemy, *args) -> object:
     :return: The subclass object
     """
 
-    localisers = {
-        "Slime": Slime
-    }
+    return ENEMIES[enemy](*args)
 
-    return localisers[enemy](*args)
+
+# Frames that have already been cut out of each sheet image, shared between all Spritesheets using the image
+# Maps sheet -> {(width, height, length, scale, direction): list of frames, None until first used}
+# Entries are dropped automatically once nothing uses the sheet image any more
+FRAME_CACHE = weakref.WeakKeyDictionary()
 
 
 class Spritesheet:
@@ -42,6 +42,7 @@ class Spritesheet:
         self.speed = speed
         self.direction = direction
         self.frame = 0
+        self.frames = self.get_frames(direction)
 
     def update(self):
         """
@@ -53,18 +54,49 @@ class Spritesheet:
             # Resets when reaching the end of the spritesheet strip
             self.frame = 0
 
-    def get_image(self) -> pygame.Surface:
+    def get_frames(self, direction: str) -> list:
+        """
+        :param direction: 'r' or 'l'
+        :return: The shared list of cached frames for this sheet facing the given direction
+        """
+        return FRAME_CACHE.setdefault(self.sheet, {}).setdefault(
+            (self.width, self.height, self.length, self.scale, direction), [None] * self.length)
+
+    def cut_frame(self, index: int, direction: str) -> pygame.Surface:
+        """
+        Cuts a frame out of the sheet, scales it and flips it if needed, then stores it in the cache
+        Left facing frames are flipped copies of the cached right facing frames
+        :param index: The position of the frame on the sheet
+        :param direction: 'r' or 'l'
+        :return: The finished frame
+        """
+        frames = self.get_frames(direction)
+        if direction == 'l':
+            image = pygame.transform.flip(self.cut_frame(index, 'r'), True, False)  # Flips the image horizontally
+        elif frames[index] is not None:
+            return frames[index]
+        else:
+            image = pygame.Surface((self.width, self.height), pygame.SRCALPHA)
+            # 'cuts out' the relevant frame from the Spritesheet
+            image.blit(self.sheet, (0, 0), (self.width * index, 0, self.width, self.height))
+            image = pygame.transform.scale_by(image, self.scale)
+
+        if pygame.display.get_surface() is not None:
+            image = image.convert_alpha()  # Can only convert to the display's format if there is a display
+        frames[index] = image
+        return frames[index]
+
+    def get_image(self, frame=None) -> pygame.Surface:
         """"
+        Frames are only cut out of the sheet the first time they are used, after that the cached copy is returned
+        :param frame: The frame count to get the image for, defaults to the Spritesheet's own
         :return: Current frame from Spritesheet as an image
         """
-        image = pygame.Surface((self.width, self.height), pygame.SRCALPHA).convert_alpha()
-        # 'cuts out' the relevant frame from the Spritesheet
-        image.blit(self.sheet, (0, 0), (self.width * (self.frame // self.speed), 0, self.width, self.height))
-        image = pygame.transform.scale_by(image, self.scale)
-        if self.direction == 'l':
-            image = pygame.transform.flip(image, True, False)  # Flips the image horizontally
-
-        return image.convert_alpha()
+        index = (self.frame if frame is None else frame) // self.speed
+        image = self.frames[index]
+        if image is None:
+            image = self.cut_frame(index, self.direction)
+        return image
 
     def get_frame(self) -> int:
         """
@@ -82,26 +114,33 @@ class Spritesheet:
 class Creature:
     def __init__(self, hitbox, speed, health):
         """
-        A superclass for all the enemies and the Player
+        A superclass for the Player, Enemies are kept in a swarm.Swarm instead so they can all be updated at once
         :param hitbox: A Pygame.Rect for the objects' hitbox
-        :param speed: An integer value for the number of pixels moved per frame
+        :param speed: An integer value for the number of pixels moved per tick
         :param health: An integer representing how much damage the creature can take before dying
         """
         self.hitbox = hitbox
+        self.previous_pos = (hitbox.x, hitbox.y)  # Position at the start of the current tick, for interpolation
         self.speed = speed
         self.spritesheets = {}
         self.state = 'run_left'
         self.max_health = health
         self.current_health = self.max_health
+        # The last Tile found by get_tile and the Tile boundaries/layout it was found for
+        self.tile = None
+        self.tile_key = None
 
     def get_tile(self):
         """
+        Only looks the Tile up again if the hitbox has crossed a Tile boundary or the Room has changed
         :return: the tile that the Creature is currently occupying
         """
-        for column in rooms.TILES:
-            for tile in column:
-                if pygame.Rect.colliderect(self.hitbox, tile.get_hitbox()) and not tile.return_occupied():
-                    return tile
+        span = rooms.get_tile_span(self.hitbox)
+        key = (span, rooms.LAYOUT_VERSION)
+        if key != self.tile_key:
+            self.tile = rooms.get_free_tile(span)
+            self.tile_key = key
+        return self.tile
 
     def get_hitbox(self) -> pygame.Rect:
         """
@@ -109,11 +148,30 @@ class Creature:
         """
         return self.hitbox
 
-    def return_sprite(self) -> pygame.Surface:
+    def save_position(self):
+        """
+        Remembers where the Creature is at the start of a tick so drawing can interpolate towards the new position
+        """
+        self.previous_pos = (self.hitbox.x, self.hitbox.y)
+
+    def get_draw_offset(self, alpha: float) -> tuple:
+        """
+        :param alpha: How far through the current tick the frame being drawn is, from 0 to 1
+        :return: The (x, y) to move the sprite by so it is drawn between its last and current positions
         """
-        :return: Image from the Spritesheet after updating
+        return (round((self.previous_pos[0] - self.hitbox.x) * (1 - alpha)),
+                round((self.previous_pos[1] - self.hitbox.y) * (1 - alpha)))
+
+    def animate(self):
+        """
+        Moves the current animation on by one frame, called once per tick
         """
         self.spritesheets[self.state].update()
+
+    def return_sprite(self) -> pygame.Surface:
+        """
+        :return: The current image from the Spritesheet
+        """
         return self.spritesheets[self.state].get_image()
 
     def hit(self, damage: int):
@@ -151,28 +209,24 @@ class Player(Creature):
         :param y: starting y-coord
         """
         super().__init__(pygame.Rect(x, y, 40, 70), 10, 300)
+        # Each sheet is shared by the left and right facing animations
+        idle = assets.load_image('Sprites', 'Player', 'Idle.png')
+        run = assets.load_image('Sprites', 'Player', 'Run.png')
+        attack = assets.load_image('Sprites', 'Player', 'Attack.png')
+        secondary = assets.load_image('Sprites', 'Player', 'Secondary.png')
+        dash = assets.load_image('Sprites', 'Player', 'Dash.png')
         # Dict containing all the spritesheets for the Player's animations
         self.spritesheets = {
-            'idle_right': Spritesheet(pygame.image.load(os.path.join(
-                'Sprites', 'Player', 'Idle.png')), 128, 128, 6, 1.5, 1, 'r'),
-            'idle_left': Spritesheet(pygame.image.load(os.path.join(
-                'Sprites', 'Player', 'Idle.png')), 128, 128, 6, 1.5, 1, 'l'),
-            'run_right': Spritesheet(pygame.image.load(os.path.join(
-                'Sprites', 'Player', 'Run.png')), 128, 128, 8, 1.5, 1, 'r'),
-            'run_left': Spritesheet(pygame.image.load(os.path.join(
-                'Sprites', 'Player', 'Run.png')), 128, 128, 8, 1.5, 1, 'l'),
-            'attack_right': Spritesheet(pygame.image.load(os.path.join(
-                'Sprites', 'Player', 'Attack.png')), 128, 128, 4, 1.5, 2, 'r'),
-            'attack_left': Spritesheet(pygame.image.load(os.path.join(
-                'Sprites', 'Player', 'Attack.png')), 128, 128, 4, 1.5, 2, 'l'),
-            'secondary_right': Spritesheet(pygame.image.load(os.path.join(
-                'Sprites', 'Player', 'Secondary.png')), 128, 128, 5, 1.5, 2, 'r'),
-            'secondary_left': Spritesheet(pygame.image.load(os.path.join(
-                'Sprites', 'Player', 'Secondary.png')), 128, 128, 5, 1.5, 2, 'l'),
-            'dash_right': Spritesheet(pygame.image.load(os.path.join(
-                'Sprites', 'Player', 'Dash.png')), 128, 128, 4, 1.5, 2, 'r'),
-            'dash_left': Spritesheet(pygame.image.load(os.path.join(
-                'Sprites', 'Player', 'Dash.png')), 128, 128, 4, 1.5, 2, 'l'),
+            'idle_right': Spritesheet(idle, 128, 128, 6, 1.5, 1, 'r'),
+            'idle_left': Spritesheet(idle, 128, 128, 6, 1.5, 1, 'l'),
+            'run_right': Spritesheet(run, 128, 128, 8, 1.5, 1, 'r'),
+            'run_left': Spritesheet(run, 128, 128, 8, 1.5, 1, 'l'),
+            'attack_right': Spritesheet(attack, 128, 128, 4, 1.5, 2, 'r'),
+            'attack_left': Spritesheet(attack, 128, 128, 4, 1.5, 2, 'l'),
+            'secondary_right': Spritesheet(secondary, 128, 128, 5, 1.5, 2, 'r'),
+            'secondary_left': Spritesheet(secondary, 128, 128, 5, 1.5, 2, 'l'),
+            'dash_right': Spritesheet(dash, 128, 128, 4, 1.5, 2, 'r'),
+            'dash_left': Spritesheet(dash, 128, 128, 4, 1.5, 2, 'l'),
         }
         # A pygame rectangle representing the portion of health the player has left
         self.health_bar = pygame.Rect(10, 980, 400, 60)
@@ -205,7 +259,7 @@ class Player(Creature):
         Method that takes a key input from the user and maps it to a game action
         Updates the Player's sprite based on the state attribute
         Controls cooldowns
-        :param key: The dictionary containing all button inputs from that frame, given by pygame
+        :param key: The dictionary containing all button inputs for that tick, given by pygame
         """
         if self.state in ['idle_left', 'idle_right', 'run_left', 'run_right']:
             # Basic movement inputs
@@ -328,8 +382,7 @@ class Player(Creature):
                 pass
 
         # Damages all enemies
-        for enemy in enemies:
-            enemy.hit(25)
+        hit_enemies(enemies, 25)
 
     def secondary_attack(self):
         """
@@ -395,8 +448,7 @@ class Player(Creature):
                 pass
 
         # Damages the enemies
-        for enemy in enemies:
-            enemy.hit(50)
+        hit_enemies(enemies, 50)
 
     def dash(self):
         """
@@ -413,8 +465,7 @@ class Player(Creature):
                 self.hitbox.x += 3 * self.speed
 
         # Damagin Enemies on the occupied Tile
-        for enemy in self.get_tile().get_enemies():
-            enemy.hit(5)
+        hit_enemies(self.get_tile().get_enemies(), 5)
 
     def get_healthbar(self) -> pygame.Rect:
         """
@@ -438,12 +489,46 @@ class Player(Creature):
 
     def get_tile(self):
         """
+        Uses the Tile under the centre of the hitbox, unlike other Creatures
         :return: the tile that the Creature is currently occupying
         """
-        for column in rooms.TILES:
-            for tile in column:
-                if tile.get_hitbox().collidepoint(self.hitbox.center):
-                    return tile
+        x, y = self.hitbox.center
+        key = (x // rooms.TILE_SIZE, y // rooms.TILE_SIZE, rooms.LAYOUT_VERSION)
+        if key != self.tile_key:
+            self.tile = rooms.get_tile_at(x, y)
+            self.tile_key = key
+        return self.tile
+
+    def get_state(self) -> dict:
+        """
+        Used to save a run
+        :return: Dict of everything about the Player that changes during a run
+        """
+        return {
+            'position': (self.hitbox.x, self.hitbox.y),
+            'previous_position': self.previous_pos,
+            'state': self.state,
+            'health': self.current_health,
+            'cooldowns': {name: list(values) for name, values in self.cooldowns.items()},
+            'gold': self.gold,
+            'frames': {name: sheet.frame for name, sheet in self.spritesheets.items()},
+        }
+
+    def set_state(self, state: dict):
+        """
+        Puts the Player back how they were when get_state() was called
+        :param state: Dict from get_state()
+        """
+        self.hitbox.topleft = state['position']
+        self.previous_pos = tuple(state['previous_position'])
+        self.state = state['state']
+        self.current_health = state['health']
+        for name, values in state['cooldowns'].items():
+            self.cooldowns[name][:] = values
+        self.gold = state['gold']
+        for name, frame in state['frames'].items():
+            self.spritesheets[name].frame = frame
+        self.tile_key = None  # The Tile has to be found again in the new Room
 
     def save_data(self):
         """
@@ -455,117 +540,112 @@ class Player(Creature):
         self.data.close()  # Closing the file saves the data
 
 
-class Enemy(Creature):
-    def __init__(self, difficulty, speed, health, damage, hitbox, droppable):
+def hit_enemies(enemies: list, damage: int):
+    """
+    Damages a group of Enemies in one go, any that die drop their loot
+    :param enemies: The Enemies to damage, all from the same Room and each only given once
+    :param damage: The damage each Enemy takes
+    """
+    if enemies:
+        enemies[0].swarm.hit([enemy.index for enemy in enemies], damage)
+
+
+class Enemy:
+    # Stats shared by every Enemy of a kind, set by each subclass
+    # along with a get_spritesheets(colour) staticmethod, which the Swarm uses to draw the kind
+    speed = 0  # Number of pixels moved per tick
+    health = 0  # Hit points that the Enemy can receive before dying, before scaling with difficulty
+    damage = 0  # Before scaling with difficulty
+    size = (0, 0)  # Width and height of the hitbox
+    droppable = {}  # All the items the enemy can drop upon death, mapped to their value
+    colours = []  # Names of the sprite colours, one is picked at random for each Enemy
+    sprite_offsets = ()  # (x, y) from the hitbox to draw the sprite at, for each state in swarm.STATES order
+
+    def __init__(self, swarm, x, y, difficulty, index=None):
         """
         Class for all the enemies in the game
-        Inherits from Creature class
+        Everything about an Enemy is kept in the Room's Swarm so all Enemies can be updated at once,
+        an Enemy object is just a view of its place in the Swarm
+        :param swarm: The Swarm of the Room the Enemy is in
+        :param x: Starting x coord of the centre of the hitbox
+        :param y: Starting y coord of the centre of the hitbox
         :param difficulty: Scalar to increase class difficulty as the game continues
-        :param speed: Number of pixels moved per frame
-        :param health: Hit points that the Enemy can receive before dying
-        :param hitbox: Pygame Rect that governs all collisions
-        :param droppable: All the items the enemy can drop upon death
-        """
-        super().__init__(hitbox, speed, int(health * difficulty))  # Health scales with difficulty
-        self.difficulty = difficulty
-        self.damage = int(damage * difficulty)  # Damage scales with difficulty
-        self.droppable = droppable
-        self.health_bar = pygame.Rect(self.hitbox.x, self.hitbox.y - 20, 50, 10)
-        self.under_bar = pygame.Rect(self.hitbox.x, self.hitbox.y - 20, 50, 10)
-
-    def move(self, dest):
-        """
-        Method to move the Enemy after each frame, uses astar algorithm
-        :param dest: The target Tile
-        """
-        if self.get_tile() is not None:
-            if len(astar.astar(self.get_tile(), dest)) > 1:
-                tile = astar.astar(self.get_tile(), dest)[-2]
-                # Selects the nearest tile on the path to the destination other than its own tile
-
-                if astar.manhattan(self.get_tile(), dest) > 75:
-                    # Checks if the enemy is close enough to the destination to make and attack
-                    dist_x = self.hitbox.centerx - tile.get_center('x')
-                    dist_y = self.hitbox.centery - tile.get_center('y')
-                    tot_dist = ((dist_x ** 2) + (dist_y ** 2)) ** 0.5
-                    scale_factor = self.speed / tot_dist
-                    self.hitbox.x -= dist_x * scale_factor
-                    self.hitbox.y -= dist_y * scale_factor
-
-                    if dist_x > 0:
-                        self.state = 'move_right'
-                    else:
-                        self.state = 'move_left'
-
-                else:
-                    if self.state == 'move_right':
-                        self.state = 'attack_left'
-                    elif self.state == 'move_left':
-                        self.state = 'attack_right'
-
-        # Makes it so that the dmage dealt to the Player lines up with the animation
-        if self.spritesheets[self.state].get_frame() == self.spritesheets[self.state].get_len() \
-                and astar.manhattan(self.get_tile(), system.PLAYER.get_tile()) < 75:
-            system.PLAYER.hit(5)
-
-    def get_health_bar(self) -> tuple:
-        """
-        Gives the two rectangles that display the Enemy's health barto the user'
-        :return: The 2 rectangles; under_bar, health_bar
-        """
-        self.health_bar = pygame.Rect(self.hitbox.x, self.hitbox.y - 20, 50 * (self.current_health / self.max_health),
-                                      10)
-        self.under_bar = pygame.Rect(self.hitbox.x, self.hitbox.y - 20, 50, 10)
-        return self.under_bar, self.health_bar
+        :param index: If given, the view is of an Enemy already in the Swarm, e.g. one loaded from a save
+        """
+        self.swarm = swarm
+        self.index = swarm.add(self, x, y, difficulty) if index is None else index
+
+    def get_hitbox(self) -> pygame.Rect:
+        """
+        :return: A copy of the pygame rectangle that governs the Enemy's collisions
+        """
+        return self.swarm.get_hitbox(self.index)
+
+    def set_center(self, x: int, y: int):
+        """
+        Moves the Enemy's hitbox
+        :param x: x-coord for the centre of the hitbox
+        :param y: y-coord for the centre of the hitbox
+        """
+        self.swarm.set_center(self.index, x, y)
+
+    def get_tile(self):
+        """
+        Only looks the Tile up again if the hitbox has crossed a Tile boundary or the Room has changed
+        :return: the tile that the Enemy is currently occupying
+        """
+        return self.swarm.get_tile(self.index)
+
+    def get_state(self) -> str:
+        """
+        :return: The name of the Enemy's current animation
+        """
+        return swarm.STATES[self.swarm.state[self.index]]
 
     def hit(self, damage: int):
         """
-        Slightly different to the Player's hit method
         Causes the Enemy to take damage and drop gold if they die
         :param damage: The amount of damage to be taken
         """
-        self.current_health -= damage
-        if self.is_dead():
-            drop = random.choice(list(self.droppable.keys()))  # Picks a random item from droppables
-            if drop == 'gold':
-                value = int(self.droppable[drop] * self.difficulty)
-                self.get_tile().add_loot(items.Gold(value, self.hitbox.x, self.hitbox.y))
+        self.swarm.hit([self.index], damage)
 
-
-class Slime(Enemy):
-    def __init__(self, x, y, difficulty):
+    def is_dead(self) -> bool:
         """
-        Class for the Slime enemy
-        :param x: Starting x coord
-        :param y: Starting y coord
-        :param difficulty: Starting difficulty
+        :return: If the Enemy is alive or dead, based on their current hit points
         """
-        super().__init__(difficulty, 5, 50, 20, pygame.Rect(x, y, 50, 30),
-                         {'gold': 5})
+        return bool(self.swarm.health[self.index] <= 0)
 
-        self.colour = random.choice(['Red', 'Green', 'Blue'])
 
-        # Dict containing all the spritesheets for the Slime's animations
-        self.spritesheets = {
-            'move_right': Spritesheet(pygame.image.load(os.path.join(
-                'Sprites', 'Enemies', 'Slime', self.colour, 'Move.png')), 128, 128, 7, 1, 1, 'r'),
-            'move_left': Spritesheet(pygame.image.load(os.path.join(
-                'Sprites', 'Enemies', 'Slime', self.colour, 'Move.png')), 128, 128, 7, 1, 1, 'l'),
-            'attack_right': Spritesheet(pygame.image.load(os.path.join(
-                'Sprites', 'Enemies', 'Slime', self.colour, 'Attack.png')), 128, 128, 4, 1, 3, 'r'),
-            'attack_left': Spritesheet(pygame.image.load(os.path.join(
-                'Sprites', 'Enemies', 'Slime', self.colour, 'Attack.png')), 128, 128, 4, 1, 3, 'l'),
+class Slime(Enemy):
+    """
+    Class for the Slime enemy
+    """
+    speed = 5
+    health = 50
+    damage = 20
+    size = (50, 30)
+    droppable = {'gold': 5}
+    colours = ['Red', 'Green', 'Blue']
+    # The sprite is drawn further left unless the Slime is moving right
+    sprite_offsets = ((-35, -100), (-45, -100), (-45, -100), (-45, -100))
+
+    @staticmethod
+    def get_spritesheets(colour: str) -> dict:
+        """
+        :param colour: 'Red', 'Green' or 'Blue'
+        :return: Dict containing all the spritesheets for the Slime's animations
+        """
+        move = assets.load_image('Sprites', 'Enemies', 'Slime', colour, 'Move.png')
+        attack = assets.load_image('Sprites', 'Enemies', 'Slime', colour, 'Attack.png')
+        return {
+            'move_right': Spritesheet(move, 128, 128, 7, 1, 1, 'r'),
+            'move_left': Spritesheet(move, 128, 128, 7, 1, 1, 'l'),
+            'attack_right': Spritesheet(attack, 128, 128, 4, 1, 3, 'r'),
+            'attack_left': Spritesheet(attack, 128, 128, 4, 1, 3, 'l'),
         }
 
-        self.state = 'move_left'
-        self.sprite = self.return_sprite()
-        self.hitbox.center = [x, y]
 
-    def get_coords(self) -> list:
-        """
-        :return: The coordinates that the sprite needs to be drawn to in order for the hitbox to be centered
-        """
-        if self.state == 'move_right':
-            return [self.hitbox.x - 35, self.hitbox.y - 100]
-        else:
-            return [self.hitbox.x - 45, self.hitbox.y - 100]
+# Maps the name of each Enemy subclass to the class, used by Factory and when loading a saved run
+ENEMIES = {
+    'Slime': Slime,
+}
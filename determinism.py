@@ -0,0 +1,86 @@
+import os
+import argparse
+import random
+import subprocess
+import sys
+import tempfile
+
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')  # Otherwise both processes print it
+
+# Room sizes that are checked, None is one screen, the large Room has chunks loaded and unloaded as the Player moves
+SIZES = {'default': None, 'large': (120, 90)}
+TICKS = 3000  # Most ticks each recorded run is played for
+FOLDER = os.path.dirname(os.path.abspath(__file__))  # The game loads its sprites and data from here
+
+
+def record(path: str, room_size, seed: int, ticks: int):
+    """
+    Plays a run with the ScriptedPlayer, drawing every tick like the game does, and records it with replay.Recorder
+    Has to run in its own process, as system decides if it draws when it is first imported
+    :param path: File to save the recording to
+    :param room_size: The number of (columns, rows) of Tiles in every Room, None for one screen
+    :param seed: Seed for the run and for how far between ticks each frame is drawn
+    :param ticks: Most ticks to play for, stops early if the Player dies
+    """
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'  # Everything is still drawn, just not shown
+    import system
+    import headless  # Only for the ScriptedPlayer, system has already been imported so the game still draws
+    import rooms
+    import replay
+
+    if room_size is not None:
+        # Starts in the middle of the Room, so the camera is near chunks that haven't been loaded from the first frame
+        state = system.PLAYER.get_state()
+        state['position'] = (room_size[0] // 2 * rooms.TILE_SIZE, room_size[1] // 2 * rooms.TILE_SIZE)
+        system.PLAYER.set_state(state)
+    rng = random.Random(seed)
+    policy = headless.ScriptedPlayer()
+    game = system.System(room_size=room_size, recorder=replay.Recorder(path))
+    system.STATE = 'game_running'
+    game.new_run(seed)
+    for _ in range(ticks):
+        if system.STATE != 'game_running':
+            break
+        room = game.current_room
+        game.step(policy.get_keys(room))
+        if game.current_room is room and policy.wants_attack(room):
+            game.attack()
+        game.draw(rng.random())  # Frames are drawn part way between ticks
+    game.recorder.finish(game)
+
+
+def check(name: str, seed: int, ticks: int) -> bool:
+    """
+    Records a windowed run in one process then plays it back in headless.py in another
+    :param name: Key of SIZES for the Room size to check
+    :param seed: Seed for the run
+    :param ticks: Most ticks to play for
+    :return: If the replay played out the same way as the recorded run
+    """
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'run.rec')
+        command = [sys.executable, os.path.abspath(__file__), '--record', path, '--size', name,
+                   '--seed', str(seed), '--ticks', str(ticks)]
+        subprocess.run(command, cwd=FOLDER, check=True)
+        replayed = subprocess.run([sys.executable, 'headless.py', '--replay', path], cwd=FOLDER,
+                                  stdout=subprocess.PIPE, text=True)
+    print('{} room: {}'.format(name, 'matches' if replayed.returncode == 0 else 'played out differently'))
+    for line in replayed.stdout.splitlines():
+        print('    ' + line)
+    return replayed.returncode == 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Checks that runs played with a window replay the same way headless')
+    parser.add_argument('--seed', type=int, default=0, help='seed for the runs')
+    parser.add_argument('--ticks', type=int, default=TICKS, help='most ticks to play each run for')
+    parser.add_argument('--size', choices=sorted(SIZES), help='only check one Room size')
+    parser.add_argument('--record', metavar='FILE', help=argparse.SUPPRESS)  # Used for the windowed process
+    args = parser.parse_args()
+
+    if args.record:
+        record(args.record, SIZES[args.size], args.seed, args.ticks)
+    else:
+        results = [check(name, args.seed, args.ticks) for name in ([args.size] if args.size else SIZES)]
+        if not all(results):
+            sys.exit(1)
@@ -0,0 +1,136 @@
+import heapq
+import astar
+import rooms
+
+
+INFINITY = float('inf')
+
+
+class FlowField:
+    def __init__(self):
+        """
+        Class for a Dijkstra map rooted at one goal Tile, shared by every Enemy heading to it
+        Stores the distance to the goal and the next Tile to move to for every Tile the search has reached
+        The search is only run as far as it needs to go to answer the Tiles that have been asked about,
+        and is carried on from where it stopped the next time a Tile further away is asked about
+        When the goal moves to a neighbouring Tile the field is repaired rather than started again, see move_goal()
+        Only started again when the goal jumps further than that or the occupancy of the Room changes
+        """
+        self.goal = None  # The (column, row) of the goal Tile
+        self.version = None  # The rooms.LAYOUT_VERSION the field was built from
+        self.offset = 0  # Added to every distance stored to get the real one, see move_goal()
+        self.distances = {}  # Maps each (column, row) the search has reached to the cheapest known path cost
+        self.next_steps = {}  # Maps each (column, row) the search has reached to the (column, row) to move to next
+        # Tiles whose distance has gone down but whose neighbours haven't been told yet, as (distance, (column, row))
+        # The edge of the search, and after a repair the Tiles the new goal is closer to
+        self.open_heap = []
+
+    def update(self, goal):
+        """
+        Moves the field to the goal if it has moved to a new Tile, starts it again if an obstacle has changed
+        :param goal: The goal Tile, usually the Player's Tile
+        """
+        coords = None if goal is None else (goal.get_column(), goal.get_row())
+        if coords == self.goal and self.version == rooms.LAYOUT_VERSION:
+            return
+        if self.version != rooms.LAYOUT_VERSION or not self.move_goal(coords):
+            self.build(coords)
+
+    def build(self, goal: tuple):
+        """
+        Throws away the old search and starts a new one from the goal, Tiles are only searched once asked about
+        :param goal: The (column, row) of the goal Tile, or None to clear the field
+        """
+        self.goal = goal
+        self.version = rooms.LAYOUT_VERSION
+        self.offset = 0
+        self.distances = {}
+        self.next_steps = {}
+        self.open_heap = []
+        if goal is not None:
+            self.distances[goal] = 0
+            self.open_heap.append((0, goal))
+
+    def move_goal(self, goal) -> bool:
+        """
+        Repairs the field when the goal moves one Tile, which is how the Player usually moves
+        Every distance found so far is still the cost of a real path to the new goal, by way of the old goal,
+        so it is kept as an upper bound and only the Tiles the new goal is closer to are searched again
+        Those all go up by the same step cost, which is added to offset rather than to each distance,
+        so the repair costs the same however much of the field had been searched
+        :param goal: The (column, row) of the new goal Tile, or None
+        :return: False if the field has to be started again instead, as the new goal isn't next to the old one
+        """
+        if self.goal is None or goal is None:
+            return False
+        for dx, dy, cost in astar.NEIGHBOURS:
+            if (self.goal[0] + dx, self.goal[1] + dy) == goal:
+                break
+        else:
+            return False
+        if rooms.TILES.get_occupied(*self.goal) != 0 or rooms.TILES.get_occupied(*goal) != 0:
+            return False  # There is no step between the two goals for paths to take
+
+        self.next_steps[self.goal] = goal  # Paths that led to the old goal carry on to the new one
+        self.next_steps.pop(goal, None)
+        self.goal = goal
+        self.offset += cost
+        self.distances[goal] = -self.offset  # A real distance of 0
+        heapq.heappush(self.open_heap, (-self.offset, goal))
+        return True
+
+    def expand(self, target: tuple):
+        """
+        Carries on Dijkstra's algorithm outwards from the goal over traversable Tiles in loaded chunks,
+        until the target's distance is final or every Tile that can reach the goal has been searched
+        A distance is final once nothing left on the heap is closer, as any shorter path would have to come
+        from one of those Tiles
+        Enemies in chunks that aren't loaded are too far away to chase the Player
+        Uses the same octile costs and neighbour rules as astar.astar so both find paths of the same length
+        Tiles come off the heap in the same order however many times the search is stopped, so until the goal
+        moves the result is the same as searching the whole Room at once. After move_goal() the distances are
+        still exact, but ties between equally short paths can be broken differently
+        :param target: The (column, row) to search until
+        """
+        get_occupied = rooms.TILES.get_occupied
+        distances = self.distances
+        next_steps = self.next_steps
+        open_heap = self.open_heap
+        limit = distances.get(target, INFINITY)
+        while open_heap and open_heap[0][0] < limit:
+            dist, current = heapq.heappop(open_heap)
+            if dist > distances[current]:
+                continue  # Stale entry left behind when a cheaper route to the coordinate was found
+
+            for dx, dy, cost in astar.NEIGHBOURS:
+                coords = (current[0] + dx, current[1] + dy)
+                new_dist = dist + cost
+                old_dist = distances.get(coords)
+                if old_dist is not None and new_dist >= old_dist:
+                    continue
+                if get_occupied(*coords) != 0:
+                    continue  # Outside the Room, not loaded or blocked
+
+                distances[coords] = new_dist
+                next_steps[coords] = current  # Moving back along the search leads to the goal
+                heapq.heappush(open_heap, (new_dist, coords))
+                if coords == target:
+                    limit = new_dist
+
+    def get_steps(self, coords: list) -> list:
+        """
+        Used by the Swarm every tick for every Enemy at once, so it has to be quick
+        Only searches as far as it has to, carrying on from where the last call stopped
+        :param coords: List of the (column, row) of each Tile
+        :return: List of the (column, row) of the next Tile on the shortest path to the goal for each,
+        None where on the goal or the goal can't be reached
+        """
+        distances = self.distances
+        next_steps = self.next_steps
+        open_heap = self.open_heap
+        steps = []
+        for target in coords:
+            if open_heap and open_heap[0][0] < distances.get(target, INFINITY):
+                self.expand(target)
+            steps.append(next_steps.get(target))
+        return steps
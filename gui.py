@@ -5,96 +5,122 @@ pygame.init()
 pygame.font.init()
 
 FONT = pygame.font.Font('ArcadeFont.ttf', 40)
-
-
-def pause_menu():
+NOTICE_FONT = pygame.font.Font('ArcadeFont.ttf', 20)  # For the line of text under a menu's buttons
+MENU_WAIT = 1000  # Longest time in ms a menu sleeps waiting for input before checking again
+
+
+class Menu:
+    def __init__(self, title, title_colour, title_pos, buttons, escape=None):
+        """
+        Class for a full screen menu made of a title and text buttons
+        All the text is rendered once here rather than every frame
+        :param title: The text at the top of the screen
+        :param title_colour: The (r, g, b) colour of the title
+        :param title_pos: The (x, y) to draw the title at
+        :param buttons: List of (text, (x, y), state) for each button, state is what STATE changes to when clicked
+        :param escape: The state to change to when the escape key is pressed, None to ignore the key
+        """
+        self.title = FONT.render(title, True, title_colour)
+        self.title_pos = title_pos
+        self.buttons = []
+        for text, pos, state in buttons:
+            surface = FONT.render(text, True, (14, 229, 236))
+            # Creates a rectangle around the text to act as a button
+            self.buttons.append((surface, surface.get_rect(x=pos[0], y=pos[1]), state))
+        self.escape = escape
+
+    def draw(self, notice=None):
+        """
+        Draws the menu to the screen and updates the display
+        :param notice: Line of text to draw under the buttons, nothing is drawn there if not given
+        """
+        system.WIN.fill((0, 0, 0))
+        system.WIN.blit(self.title, self.title_pos)
+        for surface, rect, _ in self.buttons:
+            system.WIN.blit(surface, rect)
+        if notice is not None:
+            # Split into as many lines as it takes to fit across the screen
+            lines = ['']
+            for word in notice.split():
+                line = (lines[-1] + ' ' + word).strip()
+                if lines[-1] and NOTICE_FONT.size(line)[0] > system.WIN.get_width() - 100:
+                    lines.append(word)
+                else:
+                    lines[-1] = line
+            for i, line in enumerate(lines):
+                surface = NOTICE_FONT.render(line, True, (255, 255, 255))
+                system.WIN.blit(surface, surface.get_rect(centerx=system.WIN.get_width() // 2, y=850 + 30 * i))
+        pygame.display.update()
+
+    def run(self, redraw: bool, notice=None):
+        """
+        Sleeps until there is input, then changes game state based on button presses
+        The screen is only drawn when the menu is first shown or the window needs repainting
+        :param redraw: True if something else has been drawn since this menu was last on screen
+        :param notice: Line of text to draw under the buttons, nothing is drawn there if not given
+        """
+        if redraw:
+            self.draw(notice)
+
+        event = pygame.event.wait(MENU_WAIT)  # Sleeps rather than redrawing the same menu as fast as possible
+        for event in [event] + pygame.event.get():
+            if event.type in (pygame.WINDOWEXPOSED, pygame.VIDEOEXPOSE):
+                self.draw(notice)
+
+            if event.type == pygame.KEYDOWN:
+                # Allows use of escape button as well as mouse clicks
+                if event.key == pygame.K_ESCAPE and self.escape is not None:
+                    system.STATE = self.escape
+
+            if event.type == pygame.MOUSEBUTTONDOWN:
+                for _, rect, state in self.buttons:
+                    if rect.collidepoint(event.pos):
+                        system.STATE = state
+                        break
+
+
+PAUSE_MENU = Menu('Game Paused', (255, 255, 255), (650, 200), [
+    ('Resume', (750, 500), 'game_running'),
+    ('Quit To Main Menu', (550, 700), 'menu'),
+], escape='game_running')
+
+MAIN_MENU = Menu('Main Menu', (255, 255, 255), (675, 200), [
+    ('Play', (775, 500), 'game_running'),
+    ('Quit Game', (675, 700), 'quit'),
+])
+
+DEATH_MENU = Menu('You Died', (255, 0, 0), (675, 200), [
+    ('Back to Main Menu', (525, 500), 'menu'),
+    ('Quit Game', (675, 700), 'quit'),
+])
+
+
+def pause_menu(redraw=True):
     """
     Function to display the pause menu on screen
     Changes game state based on button presses
     Contains buttons to resume and quit to main menu
+    :param redraw: True if the menu isn't already on screen
     """
-    mouse_pos = pygame.mouse.get_pos()  # Gets the mouse coordinates each frame
-    menu_text = FONT.render('Game Paused', True, (255, 255, 255))  # Text at the top of the screen
-
-    resume_text = FONT.render('Resume', True, (14, 229, 236))
-    resume_button = resume_text.get_rect(x=750, y=500)  # Creates a rectangle around the text to act as a button
-
-    quit_text = FONT.render('Quit To Main Menu', True, (14, 229, 236))
-    quit_button = quit_text.get_rect(x=550, y=700)
-
-    # Draws elements to screen
-    system.WIN.fill((0, 0, 0))
-    system.WIN.blit(menu_text, (650, 200))
-    system.WIN.blit(resume_text, (750, 500))
-    system.WIN.blit(quit_text, (550, 700))
+    PAUSE_MENU.run(redraw)
 
-    for event in pygame.event.get():
-        if event.type == pygame.KEYDOWN:
-            # Allows usee of escape button to unpause as well as mouse clicks
-            if event.key == pygame.K_ESCAPE:
-                system.STATE = 'game_running'
 
-        if event.type == pygame.MOUSEBUTTONDOWN:
-            if quit_button.collidepoint(mouse_pos):
-                system.STATE = 'menu'
-
-            elif resume_button.collidepoint(mouse_pos):
-                system.STATE = 'game_running'
-
-
-def main_menu():
+def main_menu(redraw=True, load_error=None):
     """
     Function to display the main menu to screen
     Changes game state based on button presses
     Contains play and quit game buttons
+    :param redraw: True if the menu isn't already on screen
+    :param load_error: Why the saved run couldn't be carried on, shown under the buttons if given
     """
-    mouse_pos = pygame.mouse.get_pos()
-    menu_text = FONT.render('Main Menu', True, (255, 255, 255))
-
-    play_text = FONT.render('Play', True, (14, 229, 236))
-    play_button = play_text.get_rect(x=775, y=500)
+    MAIN_MENU.run(redraw, load_error and "Couldn't carry on the last run. {}".format(load_error))
 
-    quit_text = FONT.render('Quit Game', True, (14, 229, 236))
-    quit_button = quit_text.get_rect(x=675, y=700)
 
-    system.WIN.fill((0, 0, 0))
-    system.WIN.blit(menu_text, (675, 200))
-    system.WIN.blit(play_text, (775, 500))
-    system.WIN.blit(quit_text, (675, 700))
-
-    for event in pygame.event.get():
-        if event.type == pygame.MOUSEBUTTONDOWN:
-            if quit_button.collidepoint(mouse_pos):
-                system.STATE = 'quit'
-
-            elif play_button.collidepoint(mouse_pos):
-                system.STATE = 'game_running'
-
-
-def death_menu():
+def death_menu(redraw=True):
     """
     Function to display the death screen when the Player dies
     Changes game state based on button presses
     Contains return to menu and quit game buttons
+    :param redraw: True if the menu isn't already on screen
     """
-    mouse_pos = pygame.mouse.get_pos()
-    menu_text = FONT.render('You Died', True, (255, 0, 0))
-
-    back_text = FONT.render('Back to Main Menu', True, (14, 229, 236))
-    back_button = back_text.get_rect(x=525, y=500)
-
-    quit_text = FONT.render('Quit Game', True, (14, 229, 236))
-    quit_button = quit_text.get_rect(x=675, y=700)
-
-    system.WIN.fill((0, 0, 0))
-    system.WIN.blit(menu_text, (675, 200))
-    system.WIN.blit(back_text, (525, 500))
-    system.WIN.blit(quit_text, (675, 700))
-
-    for event in pygame.event.get():
-        if event.type == pygame.MOUSEBUTTONDOWN:
-            if quit_button.collidepoint(mouse_pos):
-                system.STATE = 'quit'
-
-            elif back_button.collidepoint(mouse_pos):
-                system.STATE = 'menu'
+    DEATH_MENU.run(redraw)
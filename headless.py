@@ -0,0 +1,254 @@
+import os
+import argparse
+import sys
+import time
+
+# Must be set before system is imported, system must also be imported before any other game module
+os.environ['NEA_HEADLESS'] = '1'
+os.environ['SDL_VIDEODRIVER'] = 'dummy'
+
+import system
+import pygame
+import astar
+import rooms
+import replay
+
+ATTACK_INTERVAL = 2  # Ticks between scripted basic attacks, roughly how fast a person can click
+
+
+class ScriptedKeys(dict):
+    def __init__(self, *pressed):
+        """
+        Stands in for the key input from pygame.key.get_pressed() so the Player can be controlled by code
+        :param pressed: The pygame key constants that are held down
+        """
+        super().__init__((key, True) for key in pressed)
+
+    def __getitem__(self, key) -> bool:
+        """
+        :param key: A pygame key constant
+        :return: If the key is held down
+        """
+        return self.get(key, False)
+
+
+class ScriptedPlayer:
+    def __init__(self):
+        """
+        A simple policy that plays the game with no user input
+        Walks towards the nearest Enemy and attacks it, then walks to the Door once the Room is clear
+        """
+        self.ticks = 0
+        self.explore_target = None  # (column, row) walked towards to find Enemies that haven't been spawned yet
+        self.explore_version = None  # The rooms.LAYOUT_VERSION explore_target was found at
+
+    def get_target(self, room):
+        """
+        :param room: The current Room
+        :return: The Tile the Player should walk towards
+        """
+        player_tile = system.PLAYER.get_tile()
+        enemies = [enemy for enemy in room.get_enemies() if enemy.get_tile() is not None]
+        if enemies:
+            return min(enemies, key=lambda enemy: astar.manhattan(player_tile, enemy.get_tile())).get_tile()
+        unspawned = rooms.TILES.get_unspawned()
+        if unspawned:
+            return self.get_explore_target(player_tile, unspawned)
+        return room.get_door()
+
+    def get_explore_target(self, player_tile, unspawned: list):
+        """
+        Enemies in chunks that haven't been loaded yet can't be walked to directly, so the Player heads for
+        the Tile it can reach that is closest to the nearest of them, which loads more chunks on the way
+        Only worked out again when chunks are loaded or unloaded
+        :param player_tile: The Player's Tile
+        :param unspawned: From World.get_unspawned()
+        :return: The Tile to walk towards
+        """
+        if self.explore_version != rooms.LAYOUT_VERSION:
+            self.explore_version = rooms.LAYOUT_VERSION
+            goal = min(unspawned, key=lambda coords: abs(coords[0] - player_tile.get_column()) +
+                       abs(coords[1] - player_tile.get_row()))
+            grid, column, row, height = rooms.TILES.get_grid()
+
+            def distance(index):
+                return abs(index // height + column - goal[0]) + abs(index % height + row - goal[1])
+
+            # Breadth first search of every free loaded Tile, the grid's border stops it running off the edge
+            start = (player_tile.get_column() - column) * height + player_tile.get_row() - row
+            queue = [start]
+            seen = {start}
+            best = start
+            for index in queue:
+                if distance(index) < distance(best):
+                    best = index
+                for other in (index - height, index + height, index - 1, index + 1):
+                    if not grid[other] and other not in seen:
+                        seen.add(other)
+                        queue.append(other)
+            self.explore_target = (best // height + column, best % height + row)
+        return rooms.TILES.get_loaded(*self.explore_target)
+
+    def get_keys(self, room) -> ScriptedKeys:
+        """
+        :param room: The current Room
+        :return: The keys to hold down this tick
+        """
+        player_tile = system.PLAYER.get_tile()
+        if self.enemies_nearby():
+            return ScriptedKeys(pygame.K_e)  # Uses the secondary attack whenever it is off cooldown
+
+        target = self.get_target(room)
+        path = astar.get_path(player_tile, target)
+        if len(path) < 2:
+            return ScriptedKeys()
+
+        # Steers the centre of the hitbox towards the centre of the next Tile on the path
+        step = path[-2]
+        dist_x = step.get_center('x') - system.PLAYER.get_hitbox().centerx
+        dist_y = step.get_center('y') - system.PLAYER.get_hitbox().centery
+        pressed = []
+        if dist_x > system.PLAYER.speed // 2:
+            pressed.append(pygame.K_d)
+        elif dist_x < -system.PLAYER.speed // 2:
+            pressed.append(pygame.K_a)
+        if dist_y > system.PLAYER.speed // 2:
+            pressed.append(pygame.K_s)
+        elif dist_y < -system.PLAYER.speed // 2:
+            pressed.append(pygame.K_w)
+        return ScriptedKeys(*pressed)
+
+    def wants_attack(self, room) -> bool:
+        """
+        :param room: The current Room
+        :return: True if the Player should make a basic attack this tick
+        """
+        self.ticks += 1
+        return self.ticks % ATTACK_INTERVAL == 0 and self.enemies_nearby()
+
+    @staticmethod
+    def enemies_nearby() -> bool:
+        """
+        :return: True if there are Enemies on the Player's Tile or the Tiles either side of it
+        """
+        tile = system.PLAYER.get_tile()
+        nearby = [tile, rooms.get_left(tile), rooms.get_right(tile)]
+        return any(other is not None and other.get_enemies() for other in nearby)
+
+
+def simulate(ticks: int, policy=None, seed=None, recorder=None) -> dict:
+    """
+    Runs the game logic with no window as fast as possible
+    :param ticks: The most ticks to run for, stops early if the Player dies
+    :param policy: Object with get_keys(room) and wants_attack(room) methods, defaults to ScriptedPlayer
+    :param seed: Seed for the run, so it plays out the same way every time, the random module is used if not given
+    :param recorder: replay.Recorder to record the run with, which then always has a seed
+    :return: Statistics about the run
+    """
+    if policy is None:
+        policy = ScriptedPlayer()
+    game = system.System(recorder=recorder)
+    system.STATE = 'game_running'
+    if seed is not None or recorder is not None:
+        game.new_run(seed)
+    else:
+        system.PLAYER.heal(999)
+    astar.clear()  # So the path cache counters only cover this run
+
+    start = time.perf_counter()
+    rooms_cleared = 0
+    tick = 0
+    while tick < ticks and system.STATE == 'game_running':
+        room = game.current_room
+        game.step(policy.get_keys(room))
+        if game.current_room is not room:
+            rooms_cleared += 1
+        elif policy.wants_attack(room):
+            game.attack()
+        tick += 1
+    seconds = time.perf_counter() - start
+    if recorder is not None:
+        recorder.finish(game)
+
+    return {
+        'ticks': tick,
+        'seconds': seconds,
+        'ticks_per_second': tick / seconds if seconds else 0,
+        'rooms_cleared': rooms_cleared,
+        'difficulty': game.current_room.difficulty,
+        'dead': system.PLAYER.is_dead(),
+        'gold': system.PLAYER.get_gold(),
+        'path_hits': astar.STATS['hits'],
+        'path_misses': astar.STATS['misses'],
+    }
+
+
+def play_back(path: str) -> dict:
+    """
+    Plays a recording made with replay.Recorder as fast as possible, checking that it plays out the same way
+    :param path: The recording file
+    :return: Statistics about the replay, 'matches' is False if the game no longer plays the recording
+    the same way it did when it was recorded, 'mismatch' is then the first tick it was found to differ at
+    """
+    recording = replay.load(path)
+    game = system.System(room_size=recording['room_size'])
+    system.STATE = 'game_running'
+    system.PLAYER.set_state(recording['player'])
+    game.new_run(recording['seed'])
+
+    attacks = recording['attacks']
+    keys = {}  # Saves making a new ScriptedKeys for every tick
+    mismatch = None
+    attack = 0
+    start = time.perf_counter()
+    tick = 0
+    for tick, mask in enumerate(recording['keys'], 1):
+        while attack < len(attacks) and attacks[attack] < tick:
+            game.attack()
+            attack += 1
+        if mask not in keys:
+            keys[mask] = ScriptedKeys(*replay.get_keys(mask))
+        game.step(keys[mask])
+        if tick % replay.CHECK_TICKS == 0 and tick // replay.CHECK_TICKS <= len(recording['digests']):
+            if replay.get_digest(game) != recording['digests'][tick // replay.CHECK_TICKS - 1]:
+                mismatch = tick
+                break
+    while mismatch is None and attack < len(attacks):  # Attacks after the last tick
+        game.attack()
+        attack += 1
+    seconds = time.perf_counter() - start
+    if mismatch is None and replay.get_digest(game) != recording['result']:
+        mismatch = tick
+
+    return {
+        'ticks': tick,
+        'seconds': seconds,
+        'ticks_per_second': tick / seconds if seconds else 0,
+        'difficulty': game.current_room.difficulty,
+        'dead': system.PLAYER.is_dead(),
+        'matches': mismatch is None,
+        'mismatch': mismatch,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Runs the game logic with no window to measure simulation speed')
+    parser.add_argument('--ticks', type=int, default=10000, help='most ticks to simulate')
+    parser.add_argument('--search', choices=sorted(astar.SEARCHES), default=astar.SEARCH, help='pathfinding search to use')
+    parser.add_argument('--seed', type=int, help='seed for the run, so it plays out the same way every time')
+    parser.add_argument('--record', metavar='FILE', help='record the run so it can be played back with --replay')
+    parser.add_argument('--replay', metavar='FILE', help='play back a recording instead, exits with 1 if it plays out differently')
+    args = parser.parse_args()
+    astar.SEARCH = args.search
+
+    if args.replay:
+        try:
+            results = play_back(args.replay)
+        except (OSError, ValueError) as error:
+            sys.exit("Can't play {}: {}".format(args.replay, error))
+    else:
+        results = simulate(args.ticks, seed=args.seed, recorder=replay.Recorder(args.record) if args.record else None)
+    for name, value in results.items():
+        print('{}: {}'.format(name, value))
+    if args.replay and not results['matches']:
+        sys.exit(1)
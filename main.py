@@ -1,6 +1,18 @@
+import sys
 import system
+import snapshot
+import replay
 
 # Initiates a System object to run the game
-game = system.System()
+# Running with --dirty-rects only redraws the parts of the screen that change, for slow software renderers
+# The run in progress is autosaved and carried on the next time the game is started
+# Running with --record FILE saves the input of each new run, which headless.py --replay FILE plays back
+# Running with --seed N makes the first new run use that seed
+recorder = replay.Recorder(sys.argv[sys.argv.index('--record') + 1]) if '--record' in sys.argv else None
+seed = int(sys.argv[sys.argv.index('--seed') + 1]) if '--seed' in sys.argv else None
+game = system.System(dirty_rects='--dirty-rects' in sys.argv, save_path=snapshot.PATH, recorder=recorder, seed=seed)
+# Running with --profile N saves cProfile stats for the first N frames, F4 does the same while playing
+if '--profile' in sys.argv:
+    game.profiler.capture(int(sys.argv[sys.argv.index('--profile') + 1]))
 # Starts the main loop
 game.run()
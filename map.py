@@ -1,51 +1,170 @@
 import numpy as np
-import noise
 import random
 # Library to visualise noise map:
 # from PIL import Image as im
 
-shape = (24, 15)  # The dimensions of the numpy array, set to 24x15 to represent Tiles
-OBSTACLE_MAP = []  # Will hold coords of all obstacles given by the noise map
-ENEMY_MAP = []  # Will hold coords of all the enemies given by the noise map
-array = np.zeros(shape)  # Creates an array of 0s
+shape = (24, 15)  # The default dimensions of the numpy array, 24x15 Tiles fills the screen
 scale = 5
 
+# Values used in CLASSES for what each Tile should hold
+FREE = 0
+OBSTACLE = 1
+ENEMY = 2
 
-def generate_map():
+# Ken Perlin's permutation table, the same one the noise library uses, repeated twice to avoid wrapping indices
+PERM = np.tile(np.array([
+    151, 160, 137, 91, 90, 15, 131, 13, 201, 95, 96, 53, 194, 233, 7, 225, 140,
+    36, 103, 30, 69, 142, 8, 99, 37, 240, 21, 10, 23, 190, 6, 148, 247, 120,
+    234, 75, 0, 26, 197, 62, 94, 252, 219, 203, 117, 35, 11, 32, 57, 177, 33,
+    88, 237, 149, 56, 87, 174, 20, 125, 136, 171, 168, 68, 175, 74, 165, 71,
+    134, 139, 48, 27, 166, 77, 146, 158, 231, 83, 111, 229, 122, 60, 211, 133,
+    230, 220, 105, 92, 41, 55, 46, 245, 40, 244, 102, 143, 54, 65, 25, 63, 161,
+    1, 216, 80, 73, 209, 76, 132, 187, 208, 89, 18, 169, 200, 196, 135, 130,
+    116, 188, 159, 86, 164, 100, 109, 198, 173, 186, 3, 64, 52, 217, 226, 250,
+    124, 123, 5, 202, 38, 147, 118, 126, 255, 82, 85, 212, 207, 206, 59, 227,
+    47, 16, 58, 17, 182, 189, 28, 42, 223, 183, 170, 213, 119, 248, 152, 2, 44,
+    154, 163, 70, 221, 153, 101, 155, 167, 43, 172, 9, 129, 22, 39, 253, 19, 98,
+    108, 110, 79, 113, 224, 232, 178, 185, 112, 104, 218, 246, 97, 228, 251, 34,
+    242, 193, 238, 210, 144, 12, 191, 179, 162, 241, 81, 51, 145, 235, 249, 14,
+    239, 107, 49, 192, 214, 31, 181, 199, 106, 157, 184, 84, 204, 176, 115, 121,
+    50, 45, 127, 4, 150, 254, 138, 236, 205, 93, 222, 114, 67, 29, 24, 72, 243,
+    141, 128, 195, 78, 66, 215, 61, 156, 180
+], dtype=np.int32), 2)
+# The x and y parts of the 16 gradient directions the noise library uses for 2D noise
+GRADIENTS = np.array([
+    [1, 1], [-1, 1], [1, -1], [-1, -1], [1, 0], [-1, 0], [1, 0], [-1, 0],
+    [0, 1], [0, -1], [0, 1], [0, -1], [1, 0], [-1, 0], [0, -1], [0, 1],
+], dtype=np.float32)
+
+
+def perlin(x: np.ndarray, y: np.ndarray, repeatx: float, repeaty: float, base: int) -> np.ndarray:
     """
-    Procedure that generates a noise map and uses it to determine the positions of enemies and obstacles
-    within the game
-    Commented code is used to create a .png file of the noise map, for testing
-    """
-    seed = random.randint(0, 255)  # Picks a random seed to generate from
-    # Resets the maps to re-generate the contents
-    ENEMY_MAP.clear()
-    OBSTACLE_MAP.clear()
-
-    # Creats the perlin noise using the noise library
-    for i in range(shape[0]):
-        for j in range(shape[1]):
-            array[i][j] = noise.pnoise2(i / scale,
-                                        j / scale,
-                                        octaves=4,
-                                        persistence=.5,
-                                        lacunarity=3,
-                                        repeatx=shape[0],
-                                        repeaty=shape[1],
-                                        base=seed)
-
-    # Selects the relevant coordinates to be added to the maps
-    for i in range(shape[0]):
-        for j in range(shape[1]):
-            if array[i][j] < -0.2:
-                OBSTACLE_MAP.append([i, j])
-                # array[i][j] = 0
-            elif array[i][j] > 0.25:
-                ENEMY_MAP.append([i, j])
-            # else:
-                # array[i][j] = 1
-
-    # array = (array*255).astype(np.uint8)
-    #
-    # image = im.fromarray(array)
+    Function that calculates one octave of 2D Perlin noise for a whole array of points at once
+    Follows the noise library's pnoise2 step by step in 32-bit floats, so gives the same values
+    :param x: float32 array of x-coords
+    :param y: float32 array of y-coords, the same shape as x
+    :param repeatx: The noise repeats every repeatx along x, which lets maps tile
+    :param repeaty: The noise repeats every repeaty along y
+    :param base: Offset into the permutation table, acts as the seed
+    :return: float32 array of noise values
+    """
+    i = np.floor(np.fmod(x, repeatx)).astype(np.int32)
+    j = np.floor(np.fmod(y, repeaty)).astype(np.int32)
+    ii = np.fmod((i + 1).astype(np.float32), repeatx).astype(np.int32)
+    jj = np.fmod((j + 1).astype(np.float32), repeaty).astype(np.int32)
+    i = (i & 255) + base
+    j = (j & 255) + base
+    ii = (ii & 255) + base
+    jj = (jj & 255) + base
+
+    x = x - np.floor(x)
+    y = y - np.floor(y)
+    fx = x * x * x * (x * (x * 6 - 15) + 10)  # Smooths the interpolation so there are no visible grid lines
+    fy = y * y * y * (y * (y * 6 - 15) + 10)
+
+    # High bases can index past the end of the table, which is wrapped round rather than read out of bounds
+    a = PERM[i & 511]
+    b = PERM[ii & 511]
+    aa = PERM[PERM[(a + j) & 511]] & 15
+    ab = PERM[PERM[(a + jj) & 511]] & 15
+    ba = PERM[PERM[(b + j) & 511]] & 15
+    bb = PERM[PERM[(b + jj) & 511]] & 15
+
+    def lerp(t, start, end):
+        return start + t * (end - start)
+
+    return lerp(fy, lerp(fx, x * GRADIENTS[aa, 0] + y * GRADIENTS[aa, 1],
+                         (x - 1) * GRADIENTS[ba, 0] + y * GRADIENTS[ba, 1]),
+                lerp(fx, x * GRADIENTS[ab, 0] + (y - 1) * GRADIENTS[ab, 1],
+                     (x - 1) * GRADIENTS[bb, 0] + (y - 1) * GRADIENTS[bb, 1]))
+
+
+def fractal_noise(x: np.ndarray, y: np.ndarray, octaves: int, persistence: float, lacunarity: float,
+                  repeatx: float, repeaty: float, base: int) -> np.ndarray:
+    """
+    Function that adds together octaves of Perlin noise at increasing frequencies, like the noise library's pnoise2
+    :param x: float32 array of x-coords
+    :param y: float32 array of y-coords
+    :param octaves: The number of layers of noise
+    :param persistence: How much each octave's amplitude is scaled by
+    :param lacunarity: How much each octave's frequency is scaled by
+    :param repeatx: The noise repeats every repeatx along x
+    :param repeaty: The noise repeats every repeaty along y
+    :param base: Acts as the seed
+    :return: float32 array of noise values between about -1 and 1
+    """
+    freq = np.float32(1)
+    amp = np.float32(1)
+    total_amp = np.float32(0)
+    total = np.zeros(x.shape, dtype=np.float32)
+    for _ in range(octaves):
+        total += perlin(x * freq, y * freq, np.float32(repeatx) * freq, np.float32(repeaty) * freq, base) * amp
+        total_amp += amp
+        freq *= np.float32(lacunarity)
+        amp *= np.float32(persistence)
+    return total / total_amp
+
+
+def classify(columns: np.ndarray, rows: np.ndarray, size: tuple, seed: int) -> np.ndarray:
+    """
+    Function that works out what goes on any set of Tiles from the noise map, without making the rest of the map
+    Every Tile only depends on its own coordinates, so any part of a map matches the same part of the whole map
+    Nothing global is changed, so it is safe to call from another thread
+    :param columns: int array or list of the Tiles' columns
+    :param rows: int array or list of the Tiles' rows, the same shape as columns
+    :param size: The number of (columns, rows) in the whole map, the noise repeats at the edges
+    :param seed: Noise seed from 0 to 255
+    :return: uint8 array holding FREE, OBSTACLE or ENEMY for every Tile, the same shape as columns
+    """
+    columns = np.asarray(columns)
+    rows = np.asarray(rows)
+    # Creates the perlin noise for every Tile at once
+    array = fractal_noise((columns / scale).astype(np.float32), (rows / scale).astype(np.float32),
+                          octaves=4,
+                          persistence=.5,
+                          lacunarity=3,
+                          repeatx=size[0],
+                          repeaty=size[1],
+                          base=seed)
+
+    # Sorts every Tile into obstacles, enemies and free space
+    classes = np.full(array.shape, FREE, dtype=np.uint8)
+    classes[array < -0.2] = OBSTACLE
+    classes[array > 0.25] = ENEMY
+
+    # image = im.fromarray(((array < -0.2) * 255).astype(np.uint8))
     # image.show()
+    return classes
+
+
+def generate_area(seed: int, size: tuple, area: tuple) -> np.ndarray:
+    """
+    :param seed: Noise seed from 0 to 255
+    :param size: The number of (columns, rows) in the whole map
+    :param area: The Tiles to generate, as (first column, first row, last column + 1, last row + 1)
+    :return: uint8 array of FREE, OBSTACLE or ENEMY for the area, indexed [column - first column][row - first row]
+    """
+    columns, rows = np.meshgrid(np.arange(area[0], area[2]), np.arange(area[1], area[3]), indexing='ij')
+    return classify(columns, rows, size, seed)
+
+
+def generate_map(rng=random, size=shape) -> np.ndarray:
+    """
+    Function that generates a noise map and uses it to determine the positions of enemies and obstacles
+    within the game
+    The whole map is generated and classified with array operations rather than looping over every Tile
+    Commented code in classify() is used to create a .png file of the noise map, for testing
+    :param rng: The random number generator to pick the seed with, the random module or a random.Random
+    :param size: The number of (columns, rows) in the map
+    :return: uint8 array holding FREE, OBSTACLE or ENEMY for every Tile, indexed [column][row]
+    """
+    seed = rng.randint(0, 255)  # Picks a random seed to generate from
+    return generate_area(seed, size, (0, 0, size[0], size[1]))
+
+
+def get_enemy_coords(classes: np.ndarray) -> np.ndarray:
+    """
+    :param classes: Array given by generate_map or generate_area
+    :return: The [column, row] of every Tile that should have an Enemy, in column order
+    """
+    return np.argwhere(classes == ENEMY)
@@ -0,0 +1,134 @@
+import cProfile
+import time
+import numpy as np
+import pygame
+
+# The parts of a frame that are timed, in the order they happen in System.run
+PHASES = ('wait', 'input', 'enemy_ai', 'background', 'obstacles', 'creatures', 'hud', 'display', 'events')
+PERCENTILES = (50, 95, 99)
+RING_SIZE = 240  # Number of frames the percentiles are taken over, a few seconds at normal frame rates
+OVERLAY_INTERVAL = 30  # Frames between the overlay's numbers being worked out again, so it doesn't slow the game
+PROFILE_FRAMES = 300  # Default number of frames cProfile records for when a capture is started
+
+
+class Profiler:
+    def __init__(self):
+        """
+        Class that times each phase of every frame and keeps the last RING_SIZE frames of timings,
+        so the percentiles can be shown in an overlay while playing
+        Can also record a window of frames with cProfile to find out which functions are responsible
+        """
+        self.times = np.zeros((len(PHASES), RING_SIZE))  # Seconds spent in each phase, one column per frame
+        self.current = dict.fromkeys(PHASES, 0.0)  # Seconds spent in each phase so far this frame
+        self.frames = 0  # Number of frames finished, the next one is stored in column frames % RING_SIZE
+        self.last = time.perf_counter()  # When the last phase ended
+        self.visible = False  # If the overlay is drawn
+        self.lines = []  # The overlay's rendered lines of text, only remade every OVERLAY_INTERVAL frames
+        self.font = None
+        self.profile = None  # The cProfile.Profile recording, None if not capturing
+        self.profile_frames = 0  # Frames left to record
+        self.profile_count = 0  # Frames asked to be recorded
+        self.profile_path = None
+        self.message = None  # Line shown at the bottom of the overlay, e.g. where the last capture was saved
+
+    def mark(self, phase: str):
+        """
+        Called at the end of each phase, everything since the last mark is counted towards it
+        Phases that happen more than once in a frame, like the ticks, are added together
+        :param phase: One of PHASES
+        """
+        now = time.perf_counter()
+        self.current[phase] += now - self.last
+        self.last = now
+
+    def restart(self):
+        """
+        Forgets the time since the last mark, e.g. time spent in a menu that isn't part of any frame
+        """
+        self.current = dict.fromkeys(PHASES, 0.0)
+        self.last = time.perf_counter()
+
+    def end_frame(self):
+        """
+        Stores the timings of the frame that just finished in the ring buffer, and stops a capture once it is long enough
+        """
+        self.times[:, self.frames % RING_SIZE] = [self.current[phase] for phase in PHASES]
+        self.current = dict.fromkeys(PHASES, 0.0)
+        self.frames += 1
+        if self.visible and (not self.lines or self.frames % OVERLAY_INTERVAL == 0):
+            self.render()
+
+        if self.profile is not None:
+            self.profile_frames -= 1
+            if self.profile_frames <= 0:
+                self.profile.disable()
+                self.profile.dump_stats(self.profile_path)
+                self.message = 'saved {} frames to {}'.format(self.profile_count, self.profile_path)
+                self.profile = None
+                self.lines = []  # So the overlay shows the message next frame
+
+    def get_percentiles(self) -> dict:
+        """
+        :return: Maps each phase, and 'total' for the whole frame, to its PERCENTILES in milliseconds
+        over the frames in the ring buffer
+        """
+        times = self.times[:, :min(self.frames, RING_SIZE)] * 1000
+        if not times.size:
+            return {}
+        times = np.vstack((times, times.sum(axis=0)))  # The last row is the whole frame
+        columns = np.percentile(times, PERCENTILES, axis=1).T.tolist()
+        return dict(zip(PHASES + ('total',), columns))
+
+    def toggle(self):
+        """
+        Shows or hides the overlay
+        """
+        self.visible = not self.visible
+        self.lines = []
+
+    def capture(self, frames=PROFILE_FRAMES, path=None):
+        """
+        Records the next few frames with cProfile, the stats are saved once they are done
+        Does nothing if a capture is already running
+        :param frames: How many frames to record
+        :param path: File the stats are saved to, can be opened with pstats or snakeviz
+        """
+        if self.profile is not None:
+            return
+        self.profile_count = self.profile_frames = frames
+        self.profile_path = path or 'profile_{}.prof'.format(time.strftime('%Y%m%d_%H%M%S'))
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+
+    def render(self):
+        """
+        Works out the percentiles again and renders them as the overlay's lines of text
+        """
+        if self.font is None:
+            self.font = pygame.font.SysFont('monospace', 18)  # Lines the columns up
+        percentiles = self.get_percentiles()
+        header = '{:<12}'.format('ms') + ''.join('{:>8}'.format('p{}'.format(p)) for p in PERCENTILES)
+        rows = [header] + ['{:<12}'.format(phase) + ''.join('{:>8.2f}'.format(value) for value in values)
+                           for phase, values in percentiles.items()]
+        if self.profile is not None:
+            rows.append('profiling, {} frames left'.format(self.profile_frames))
+        elif self.message is not None:
+            rows.append(self.message)
+        self.lines = [self.font.render(row, True, (255, 255, 255)) for row in rows]
+
+    def draw(self, surface: pygame.Surface) -> list:
+        """
+        Draws the overlay in the top left of the screen if it is visible
+        :param surface: The surface to draw to
+        :return: The areas of the screen that were drawn to, for dirty rendering
+        """
+        if not self.visible or not self.lines:
+            return []
+        width = max(line.get_width() for line in self.lines) + 20
+        height = sum(line.get_height() for line in self.lines) + 20
+        area = surface.fill((0, 0, 0), (10, 10, width, height))
+        y = 20
+        for line in self.lines:
+            surface.blit(line, (20, y))
+            y += line.get_height()
+        return [area]
@@ -0,0 +1,142 @@
+import hashlib
+import io
+import pickle
+import struct
+import zlib
+import pygame
+import system
+import snapshot
+
+# The keys the Player reads, each is one bit of a recorded tick
+KEYS = (pygame.K_w, pygame.K_a, pygame.K_s, pygame.K_d, pygame.K_e, pygame.K_SPACE)
+MAGIC = b'NEAR'  # Start of every recording
+FORMAT_VERSION = 1  # Increased whenever what is recorded changes, recordings from other versions aren't loaded
+HEADER = struct.Struct('<4sH')  # MAGIC then FORMAT_VERSION
+CHECK_TICKS = 100  # Ticks between digests of the run, so a replay can tell roughly when it stopped matching
+
+
+def get_digest(game) -> str:
+    """
+    :param game: The running system.System
+    :return: Hash of everything the Player and Enemies can affect, two runs with the same digest played out the same
+    """
+    digest = hashlib.md5()
+    digest.update(repr(system.PLAYER.get_state()).encode())
+    digest.update(repr(game.current_room.difficulty).encode())
+    swarm = game.current_room.swarm
+    for array in (swarm.x, swarm.y, swarm.health, swarm.state):
+        digest.update(array[:swarm.count].tobytes())
+    return digest.hexdigest()
+
+
+def get_mask(keys) -> int:
+    """
+    :param keys: The key input for a tick, from pygame.key.get_pressed() or headless.ScriptedKeys
+    :return: The keys in KEYS that are held down, one bit each
+    """
+    mask = 0
+    for bit, key in enumerate(KEYS):
+        if keys[key]:
+            mask |= 1 << bit
+    return mask
+
+
+def get_keys(mask: int) -> list:
+    """
+    :param mask: Keys from get_mask()
+    :return: The pygame key constants that are held down
+    """
+    return [key for bit, key in enumerate(KEYS) if mask & 1 << bit]
+
+
+class Recorder:
+    def __init__(self, path: str):
+        """
+        Class that records the input of a run so it can be played back with no window, see headless.replay()
+        A run is played out the same way by the same seed, starting Player and input,
+        so that is all that is recorded, along with digests to check the replay against
+        :param path: File the recording is saved to when the run ends
+        """
+        self.path = path
+        self.recording = None  # Everything recorded so far, None if no run is being recorded
+
+    def start(self, game, seed: int):
+        """
+        Starts recording a new run, called by System.new_run() before the first Room is made
+        :param game: The running system.System
+        :param seed: The run's seed, given to streams.seed()
+        """
+        self.recording = {
+            'seed': seed,
+            'room_size': game.room_size,
+            'player': system.PLAYER.get_state(),
+            'keys': bytearray(),  # The keys held down for each tick, from get_mask()
+            'attacks': [],  # The number of ticks run before each basic attack
+            'digests': [],  # get_digest() after every CHECK_TICKS ticks
+            'result': None,  # get_digest() at the end of the run
+        }
+
+    def record_tick(self, keys):
+        """
+        Called before each tick is run
+        :param keys: The key input for the tick
+        """
+        if self.recording is not None:
+            self.recording['keys'].append(get_mask(keys))
+
+    def record_attack(self):
+        """
+        Called whenever the Player makes a basic attack, which happens between ticks
+        """
+        if self.recording is not None:
+            self.recording['attacks'].append(len(self.recording['keys']))
+
+    def check(self, game):
+        """
+        Called after each tick is run, takes a digest every CHECK_TICKS ticks
+        :param game: The running system.System
+        """
+        if self.recording is not None and len(self.recording['keys']) % CHECK_TICKS == 0:
+            self.recording['digests'].append(get_digest(game))
+
+    def finish(self, game):
+        """
+        Saves the recording, called when the run ends or the game closes
+        :param game: The running system.System
+        """
+        if self.recording is None:
+            return
+        self.recording['result'] = get_digest(game)
+        self.recording['keys'] = bytes(self.recording['keys'])
+        with open(self.path, 'wb') as file:
+            file.write(encode(self.recording))
+        self.recording = None
+
+
+def encode(recording: dict) -> bytes:
+    """
+    :param recording: Dict made by a Recorder
+    :return: The recording file's contents, a header then the compressed recording
+    """
+    return HEADER.pack(MAGIC, FORMAT_VERSION) + zlib.compress(pickle.dumps(recording, pickle.HIGHEST_PROTOCOL))
+
+
+def load(path: str) -> dict:
+    """
+    :param path: A recording file
+    :return: The recording
+    :raises ValueError: If the file isn't a recording or was made by another FORMAT_VERSION
+    """
+    with open(path, 'rb') as file:
+        data = file.read()
+    if len(data) < HEADER.size:
+        raise ValueError('Recording is too short')
+    magic, version = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError('Not a recording')
+    if version != FORMAT_VERSION:
+        raise ValueError('Recording is version {}, only version {} can be played'.format(version, FORMAT_VERSION))
+    try:
+        return snapshot.Unpickler(io.BytesIO(zlib.decompress(data[HEADER.size:]))).load()
+    except (zlib.error, pickle.UnpicklingError, EOFError) as error:
+        raise ValueError('Recording is damaged: {}'.format(error))
@@ -1,16 +1,30 @@
 import astar
 import creatures
+import flowfield
 import map
 import system
 import random
 import pygame
-import os
 import items
+import assets
+import camera
+import world
+import swarm
+import streams
+from concurrent.futures import ThreadPoolExecutor
 
 pygame.font.init()
 
-TILES = []  # 2D array for all the Tiles in the current Room
+TILES = None  # The World holding all the Tiles in the current Room, loaded a chunk at a time
+LAYOUT_VERSION = 0  # Incremented whenever the obstacles in TILES change, so cached paths know to rebuild
+TILE_SIZE = 70  # Width and height of every Tile in pixels
 FONT = pygame.font.Font('ArcadeFont.ttf', 30)
+WORKER = ThreadPoolExecutor(max_workers=1)  # Background thread that generates the next Room's Layout, see prefetch()
+BLOCK_SIZE = (1680, 1050)  # Pixel size of each block of baked background, the size of the floor image so it tiles
+MAX_BLOCKS = 6  # Most baked blocks kept per Room, blocks that haven't been drawn for longest are dropped first
+DIFFICULTY_STEP = 0.5  # Difficulty added for each Room cleared, batch.py can change it to try out other balances
+TRAP_DAMAGE = 30  # Damage a Trap does at difficulty 1
+SCALE_ENEMIES = False  # If Enemies get the Room's difficulty rather than 1, off unless batch.py turns it on
 
 
 def get_surrounding(tile) -> list:
@@ -25,22 +39,69 @@ def get_surrounding(tile) -> list:
 
     for i in range(-1, 2):
         for j in range(-1, 2):
-            if 23 >= (column + i) >= 0 and 14 >= (row + j) >= 0:
-                if TILES[column + i][row + j] != tile and not tile.return_occupied():
-                    surrounding.append(TILES[column + i][row + j])
+            other = TILES.get_tile(column + i, row + j)
+            if other is not None:
+                if other != tile and not tile.return_occupied():
+                    surrounding.append(other)
 
     return surrounding
 
 
+def get_tile_at(x: int, y: int):
+    """
+    Function that finds a Tile from pixel coordinates without searching the whole grid
+    :param x: x-coord
+    :param y: y-coord
+    :return: The Tile that contains the point, None if the point is outside the Room
+    """
+    return TILES.get_tile(x // TILE_SIZE, y // TILE_SIZE)
+
+
+def get_tile_span(hitbox: pygame.Rect) -> tuple:
+    """
+    :param hitbox: The given rectangle
+    :return: The first and last column and row touched by the rectangle as (column, row, last column, last row)
+    """
+    return (hitbox.left // TILE_SIZE, hitbox.top // TILE_SIZE,
+            (hitbox.right - 1) // TILE_SIZE, (hitbox.bottom - 1) // TILE_SIZE)
+
+
+def get_free_tile(span: tuple):
+    """
+    Function that finds the first traversable Tile touched by a rectangle, in column order
+    Only looks at loaded chunks, so Enemies far from the Player don't keep their chunks loaded
+    :param span: The columns and rows touched by the rectangle, as given by get_tile_span
+    :return: The first Tile that isn't occupied, None if there isn't one
+    """
+    for column in range(span[0], span[2] + 1):
+        for row in range(span[1], span[3] + 1):
+            if TILES.get_occupied(column, row) == 0:
+                return TILES.get_loaded(column, row)
+    return None
+
+
+def get_floor() -> pygame.Surface:
+    """
+    :return: The shared floor image that every block of background starts from, must not be drawn on
+    """
+    return assets.load_image('Sprites', 'Environment', 'Floor.png', scale=BLOCK_SIZE)
+
+
+def get_block_rect(column: int, row: int) -> pygame.Rect:
+    """
+    :param column: The block's column, counted in blocks
+    :param row: The block's row, counted in blocks
+    :return: The area of the Room that the block of background covers, in pixels
+    """
+    return pygame.Rect(column * BLOCK_SIZE[0], row * BLOCK_SIZE[1], BLOCK_SIZE[0], BLOCK_SIZE[1])
+
+
 def get_left(tile):
     """
     :param tile: The given Tile
     :return: The Tile to the left of the given Tile, if it exists
     """
-    if tile.get_column() > 0:
-        return TILES[tile.get_column() - 1][tile.get_row()]
-    else:
-        return None
+    return TILES.get_tile(tile.get_column() - 1, tile.get_row())
 
 
 def get_right(tile):
@@ -48,10 +109,7 @@ def get_right(tile):
     :param tile: The given Tile
     :return: The Tile to the right of the given Tile, if it exists
     """
-    if tile.get_column() < 23:
-        return TILES[tile.get_column() + 1][tile.get_row()]
-    else:
-        return None
+    return TILES.get_tile(tile.get_column() + 1, tile.get_row())
 
 
 def get_up(tile):
@@ -59,10 +117,7 @@ def get_up(tile):
     :param tile: The given Tile
     :return: The Tile above the given Tile, if it exists
     """
-    if tile.get_row() > 0:
-        return TILES[tile.get_column()][tile.get_row()-1]
-    else:
-        return None
+    return TILES.get_tile(tile.get_column(), tile.get_row() - 1)
 
 
 def get_down(tile):
@@ -70,41 +125,57 @@ def get_down(tile):
     :param tile: The given Tile
     :return: The Tile to below the given Tile, if it exists
     """
-    if tile.get_row() < 14:
-        return TILES[tile.get_column()][tile.get_row() + 1]
-    else:
-        return None
+    return TILES.get_tile(tile.get_column(), tile.get_row() + 1)
 
 
 class Tile:
-    def __init__(self, x, y, column, row, room):
+    __slots__ = ('chunk', 'column', 'row', 'index')
+    kind = world.FLOOR
+
+    def __init__(self, chunk, column, row):
         """
         A class for each 70x70px tile in the level
-        :param x: The x-coordinate
-        :param y: The y-coordinate
+        Everything about a Tile is kept in its chunk's arrays, so a Tile object is only a view of one place in them
+        Views are made whenever a Tile is asked for, so Tiles are compared by position rather than by identity
+        :param chunk: The world.Chunk the Tile is part of
         :param column: Its column number
         :param row: Its row number
-        :param room: The room the tile is part of
         """
-        self.x = x
-        self.y = y
+        self.chunk = chunk
         self.column = column
         self.row = row
-        self.room = room
-        self.hitbox = pygame.Rect(x, y, 70, 70)
-        self.loot = []
-        self.occupied = False
-        self.sprite = None
+        self.index = chunk.get_index(column, row)
+
+    @property
+    def x(self) -> int:
+        """
+        :return: The x-coordinate
+        """
+        return self.column * TILE_SIZE
+
+    @property
+    def y(self) -> int:
+        """
+        :return: The y-coordinate
+        """
+        return self.row * TILE_SIZE
+
+    @property
+    def room(self):
+        """
+        :return: The room the tile is part of
+        """
+        return self.chunk.world.room
 
     def get_column(self) -> int:
         """
-        :return: The Tile's column in the TILES array
+        :return: The Tile's column in the Room
         """
         return self.column
 
     def get_row(self) -> int:
         """
-        :return: The Tile's row in the TILES array
+        :return: The Tile's row in the Room
         """
         return self.row
 
@@ -112,19 +183,29 @@ class Tile:
         """
         :return: If the Tile is traversable or not
         """
-        return self.occupied
+        return self.chunk.occupied[self.index] == 1
+
+    def set_occupied(self, occupied: bool):
+        """
+        Changes if the Tile is traversable or not
+        :param occupied: True if the Tile should block movement
+        """
+        global LAYOUT_VERSION
+        if occupied != self.return_occupied():
+            self.chunk.occupied[self.index] = occupied
+            LAYOUT_VERSION += 1
 
     def get_hitbox(self) -> pygame.Rect:
         """
         :return: The rectangle that the Tile covers
         """
-        return self.hitbox
+        return pygame.Rect(self.column * TILE_SIZE, self.row * TILE_SIZE, TILE_SIZE, TILE_SIZE)
 
     def get_coords(self) -> list[int, int]:
         """
         :return: The Tiles physical coordinates as [x, y]
         """
-        return [self.x, self.y]
+        return [self.column * TILE_SIZE, self.row * TILE_SIZE]
 
     def get_center(self, coord) -> int:
         """
@@ -132,15 +213,15 @@ class Tile:
         :return: Either the x or y cooridnate of the Tile's center
         """
         if coord == 'x':
-            return self.hitbox.centerx
+            return self.column * TILE_SIZE + TILE_SIZE // 2
         elif coord == 'y':
-            return self.hitbox.centery
+            return self.row * TILE_SIZE + TILE_SIZE // 2
 
     def return_sprite(self) -> pygame.Surface:
         """
         :return: The Tile's sprite, in its current state (if animated)
         """
-        return self.sprite
+        return None
 
     def get_map_coords(self) -> list[int, int]:
         """
@@ -152,35 +233,52 @@ class Tile:
         """
         :return: A list of all the Enemies whose hitbox touches the Tile
         """
-        temp = []
-        for enemy in self.room.get_enemies():
-            if self.hitbox.colliderect(enemy.get_hitbox()):
-                temp.append(enemy)
-        return temp
+        return self.room.get_enemies_at(self.column, self.row)
 
     def add_loot(self, item):
         """
         Method that adds droppable loot to the Tile so tht it can be picked up by the Player
         :param item: The item that was dropped
         """
-        self.loot.append(item)
+        self.chunk.loot.setdefault((self.column, self.row), []).append(item)
+        self.room.loot_tiles[self] = None
 
     def get_loot(self) -> list:
         """
         :return: The list of all items that have been dropped on the Tile
         """
-        return self.loot
+        return self.chunk.loot.get((self.column, self.row), [])
 
     def take_loot(self):
         """
         Adds all items dropped on the Tile to the Player
         Only works on Gold at the moment as it is the only dropped item
         """
-        for item in self.loot:
+        loot = self.chunk.loot.get((self.column, self.row))
+        if loot is None:
+            return
+        for item in loot:
             if isinstance(item, items.Gold):
                 system.PLAYER.add_gold(item.get_value())
-                self.loot.remove(item)
+                loot.remove(item)
                 del item  # Deletes the item to save memory
+        if not loot:
+            del self.chunk.loot[(self.column, self.row)]
+            self.room.loot_tiles.pop(self, None)
+
+    def __eq__(self, other) -> bool:
+        """
+        :param other: Another object
+        :return: True if other is a view of the same Tile
+        """
+        return isinstance(other, Tile) and self.column == other.column and self.row == other.row \
+            and self.chunk.world is other.chunk.world
+
+    def __hash__(self) -> int:
+        """
+        :return: Hash of the Tile's position, so views of the same Tile can be used as the same dict key
+        """
+        return hash((self.column, self.row))
 
     def __str__(self) -> str:
         """
@@ -192,36 +290,33 @@ class Tile:
 
 
 class Barrel(Tile):
-    def __init__(self, x, y, row,  column,  room):
+    """
+    Class for all tiles in the map containing a Barrel obstacle, which can't be walked through
+    """
+    __slots__ = ()
+    kind = world.BARREL
+
+    def return_sprite(self) -> pygame.Surface:
         """
-        Class for all tiles in the map containing a Barrel obstacle
-        :param x: x-coord
-        :param y: y-coord
-        :param row: Row in the tile map
-        :param column: Column in the tile map
-        :param room: The Room that the Tile belongs to
+        :return: The Barrel sprite, the same Surface for every Barrel
         """
-        super().__init__(x, y, row, column, room)
-        self.occupied = True  # Non-traversable Tile
-        self.sprite = pygame.transform.scale_by(
-            pygame.image.load(os.path.join('Sprites', 'Environment', 'Obstacles', 'Barrel.png')), 2)
+        return assets.load_image('Sprites', 'Environment', 'Obstacles', 'Barrel.png', scale=2)
 
 
 class Trap(Tile):
-    def __init__(self, x, y, row, column, room):
+    """
+    Class for all tiles in the map containing a trap
+    """
+    __slots__ = ()
+    kind = world.TRAP
+    spritesheet = None  # Shared by every Trap, made the first time one is drawn
+
+    @property
+    def activated(self) -> bool:
         """
-        Class for all tiles in the map containing a trap
-        :param x: x-coord
-        :param y: y-coord
-        :param row: Row in the tile map
-        :param column: Column in the tile map
-        :param room: The Room that the Tile belongs to
+        :return: If the Trap has been activated, so it can't be activated multiple times
         """
-        super().__init__(x, y, row, column, room)
-        self.spritesheet = creatures.Spritesheet(pygame.image.load(
-            os.path.join('Sprites', 'Environment', 'Obstacles', 'Bear_Trap.png')), 32, 32, 4, 2, 1, 'r')
-        self.sprite = self.spritesheet.get_image()
-        self.activated = False  # Boolean to ensure that the Trap cannot be activated multiple times
+        return self.chunk.states[self.index] == 1
 
     def activate(self):
         """
@@ -229,38 +324,54 @@ class Trap(Tile):
         Damages the Player for a small amount
         """
         if not self.activated:
-            self.activated = True
-            system.PLAYER.hit(30 * self.room.difficulty)
-            self.spritesheet.update()
-            self.sprite = self.spritesheet.get_image()
+            self.chunk.states[self.index] = 1
+            system.PLAYER.hit(TRAP_DAMAGE * self.room.difficulty)
+            self.room.redraw_tile(self)
+
+    def return_sprite(self) -> pygame.Surface:
+        """
+        The sprite is only cut out of the Spritesheet when it is needed, so it is never made when running headless
+        :return: The Trap's sprite, open or closed
+        """
+        if Trap.spritesheet is None:
+            Trap.spritesheet = creatures.Spritesheet(assets.load_image(
+                'Sprites', 'Environment', 'Obstacles', 'Bear_Trap.png'), 32, 32, 4, 2, 1, 'r')
+        return Trap.spritesheet.get_image(self.chunk.states[self.index])
 
 
 class Door(Tile):
-    def __init__(self, x, y, row, column, room):
-        """
-        Class for the Door Tile in the Room
-        Each Room hs only one Door which leads to the next Room
-        Door only opens when all Enemies have been defeated
-        :param x: x-coord
-        :param y: y-coord
-        :param row: Row in the tile map
-        :param column: Column in the tile map
-        :param room: The Room that the Tile belongs to
-        """
-        super().__init__(x, y, row, column, room)
-        self.spritesheet = creatures.Spritesheet(pygame.image.load(
-            os.path.join('Sprites', 'Environment', 'Door.png')), 70, 70, 2, 1.5, 1, 'r')
-        self.sprite = self.spritesheet.get_image()
-        self.opened = False
+    """
+    Class for the Door Tile in the Room
+    Each Room hs only one Door which leads to the next Room
+    Door only opens when all Enemies have been defeated
+    """
+    __slots__ = ()
+    kind = world.DOOR
+    spritesheet = None  # Shared by every Door, made the first time one is drawn
+
+    @property
+    def opened(self) -> bool:
+        """
+        :return: If the Door is open or not
+        """
+        return self.chunk.states[self.index] == 1
 
     def open(self):
         """
         Opens the Door
         Updates the Door sprite to appear open to alert the Player
         """
-        self.opened = True
-        self.spritesheet.update()
-        self.sprite = self.spritesheet.get_image()
+        self.chunk.states[self.index] = 1
+        self.room.redraw_tile(self)
+
+    def return_sprite(self) -> pygame.Surface:
+        """
+        :return: The Door's sprite, open or closed
+        """
+        if Door.spritesheet is None:
+            Door.spritesheet = creatures.Spritesheet(assets.load_image(
+                'Sprites', 'Environment', 'Door.png'), 70, 70, 2, 1.5, 1, 'r')
+        return Door.spritesheet.get_image(self.chunk.states[self.index])
 
     def is_open(self) -> bool:
         """
@@ -269,32 +380,19 @@ class Door(Tile):
         return self.opened
 
 
+TILE_CLASSES = (Tile, Barrel, Trap, Door)  # The class for each kind of Tile, in the order of the kinds in world.py
+
+
 def draw_grid():
     """
     Method to help with debugging
     Draws a grid that outlines all tiles on the map
     """
-    for column in TILES:
-        for tile in column:
-            if tile.return_occupied():
-                pygame.draw.rect(system.WIN, (255, 0, 0), tile.get_hitbox())
-            else:
-                pygame.draw.rect(system.WIN, (255, 0, 0), tile.get_hitbox(), 1)
-
-
-def draw_obstacles():
-    """
-    Method that draws all obstacle sprites to their respective locations
-    """
-    for column in TILES:
-        for tile in column:
-            if tile.return_sprite() is not None:
-                system.WIN.blit(tile.return_sprite(), tile.get_coords())
-
-            for item in tile.get_loot():
-                if isinstance(item, items.Gold):
-                    pygame.draw.circle(system.WIN, (255, 215, 0),
-                                       (item.get_coords()[0], item.get_coords()[1]), 10)
+    for tile in TILES.get_loaded_tiles():
+        if tile.return_occupied():
+            pygame.draw.rect(system.WIN, (255, 0, 0), tile.get_hitbox())
+        else:
+            pygame.draw.rect(system.WIN, (255, 0, 0), tile.get_hitbox(), 1)
 
 
 def draw_player_hitbox():
@@ -304,112 +402,466 @@ def draw_player_hitbox():
     pygame.draw.rect(system.WIN, (0, 0, 255), system.PLAYER.get_tile().get_hitbox())
 
 
+class Layout:
+    def __init__(self, rng=random, size=map.shape, near=None, state=None):
+        """
+        Class that holds the seeds and Door for a Room, which every chunk of the Room is made from
+        Only uses its own data, so it can be made in another thread while the current Room is played
+        Each Layout should only be used for one Room, as the Room draws onto its floor
+        :param rng: The random number generator to use, the random module or a random.Random
+        :param size: The number of (columns, rows) of Tiles
+        :param near: The (column, row) the Player will start at, the chunks around it are made straight away
+        :param state: Dict from get_state() to make a saved Layout again, rng and size aren't used if given
+        """
+        if state is not None:
+            size = state['size']
+        self.size = tuple(size)
+        if state is not None:
+            self.noise_seed = state['noise_seed']
+            self.seed = state['seed']
+        else:
+            self.noise_seed = rng.randint(0, 255)  # Picks a random seed to generate the noise map from
+            self.seed = rng.getrandbits(32)  # Seed for the random choices made in each chunk
+
+        # Rooms no bigger than the area loaded around the Player are made in one go, much faster than by chunk
+        self.classes = None
+        if self.size[0] * self.size[1] <= (world.CHUNK_SIZE * (2 * world.LOAD_RADIUS + 1)) ** 2:
+            self.classes = map.generate_area(self.noise_seed, self.size, (0, 0) + self.size)
+
+        if state is not None:
+            self.door = tuple(state['door'])
+        else:
+            # List of all possible coordinates for the Door, every non-occupied Tile on the border in column order
+            border = [(x, y) for x in range(self.size[0])
+                      for y in (range(self.size[1]) if x in (0, self.size[0] - 1) else (0, self.size[1] - 1))]
+            if self.classes is not None:
+                classes = self.classes.tolist()
+                classes = [classes[x][y] for x, y in border]
+            else:
+                classes = map.classify([x for x, _ in border], [y for _, y in border],
+                                       self.size, self.noise_seed).tolist()
+            openList = [coords for coords, value in zip(border, classes) if value != map.OBSTACLE]
+            self.door = rng.choice(openList)  # Picks a random coordinate from the openList for the Door
+
+        # Caps number of Enemies at 12 per screen of Tiles to save processing power and not overwhelm Player
+        # The first ones in column order are kept, found a strip of columns at a time only as chunks need them
+        self.max_enemies = round(12 * self.size[0] * self.size[1] / (map.shape[0] * map.shape[1]))
+        self.enemies = []  # The (column, row) of the Room's Enemies found so far, in column order
+        self.scanned = 0  # Number of columns from the left that have been searched for Enemies
+        self.enemy_chunks = None  # The result of get_enemy_chunks(), only found once it is needed
+
+        self.chunks = {}  # ChunkLayouts made ahead of time, the rest are made when they are first loaded
+        keys = {world.get_chunk_key(*self.door)}
+        if near is not None:
+            keys.update(world.get_keys_near(world.get_chunk_key(*near), self.size))
+        for key in sorted(keys):
+            self.chunks[key] = self.make_chunk(key)
+
+        # Copying the floor is most of the work of baking a block of background, so it is done here as well
+        self.floor = None
+        if not system.HEADLESS:
+            self.floor = get_floor().copy()
+
+    def get_state(self) -> dict:
+        """
+        Used to save a run, everything else in the Layout is made from these
+        :return: Dict of the size, seeds and Door
+        """
+        return {'size': self.size, 'noise_seed': self.noise_seed, 'seed': self.seed, 'door': tuple(self.door)}
+
+    def get_chunk(self, key: tuple) -> world.ChunkLayout:
+        """
+        :param key: The (column, row) of the chunk, counted in chunks
+        :return: Where everything in the chunk goes
+        """
+        chunk = self.chunks.pop(key, None)  # Chunks are the same every time they are made, so aren't kept
+        if chunk is None:
+            chunk = self.make_chunk(key)
+        return chunk
+
+    def make_chunk(self, key: tuple) -> world.ChunkLayout:
+        """
+        :param key: The (column, row) of the chunk, counted in chunks
+        :return: A new ChunkLayout for the chunk
+        """
+        area = world.get_area(key, self.size)
+        return world.ChunkLayout(self.seed, self.noise_seed, self.size, key, self.get_enemies(area), self.classes)
+
+    def get_enemies(self, area: tuple) -> list:
+        """
+        Searches any columns up to the end of the area that haven't been searched yet, until the cap is reached
+        :param area: Tiles to get the Enemies of, as (first column, first row, last column + 1, last row + 1)
+        :return: The (column, row) of every Enemy in the area, in column order
+        """
+        while self.scanned < area[2] and len(self.enemies) < self.max_enemies:
+            strip = (self.scanned, 0, min(self.scanned + world.CHUNK_SIZE, self.size[0]), self.size[1])
+            if self.classes is not None:
+                classes = self.classes[strip[0]:strip[2]]
+            else:
+                classes = map.generate_area(self.noise_seed, self.size, strip)
+            coords = map.get_enemy_coords(classes)[:self.max_enemies - len(self.enemies)] + strip[:2]
+            self.enemies.extend(tuple(enemy) for enemy in coords.tolist())
+            self.scanned = strip[2]
+        return [enemy for enemy in self.enemies
+                if area[0] <= enemy[0] < area[2] and area[1] <= enemy[1] < area[3]]
+
+    def get_enemy_chunks(self) -> dict:
+        """
+        Used so the Door can't open while some Enemies haven't been spawned yet
+        :return: Maps the key of every chunk with Enemies to the (column, row) of its first Enemy
+        """
+        if self.enemy_chunks is None:
+            first = {}
+            for enemy in self.get_enemies((0, 0) + self.size):
+                first.setdefault(world.get_chunk_key(*enemy), enemy)
+            self.enemy_chunks = {key: first[key] for key in sorted(first)}
+        return self.enemy_chunks
+
+
 class Room:
-    def __init__(self, difficulty):
+    def __init__(self, difficulty, layout=None, size=map.shape, state=None):
         """
         A class to hold all the objects in one level
         :param difficulty: The difficulty scalar of all the enemies in the room
-        """
+        :param layout: The Layout to build the Room from, a new one is generated if not given
+        :param size: The number of (columns, rows) of Tiles, only used if no layout is given
+        :param state: Dict from get_state() to carry on a saved Room, difficulty and layout aren't used if given
+        """
+        if state is not None:
+            difficulty = state['difficulty']
+            layout = Layout(state=state['layout'])
+        elif layout is None:
+            layout = Layout(streams.get('rooms'), size=size)
+        self.layout = layout
+        self.size = layout.size
         self.door = None  # Will hold the Door Tile when it is created
         self.difficulty = difficulty
-        self.enemies = []  # List of all the Enemies in the Room
-        self.generate()
-
-    def generate(self):
+        self.swarm = swarm.Swarm()  # Every Enemy in the Room, updated all at once
+        self.flow_field = flowfield.FlowField()  # Shared path towards the Player used by every Enemy
+        self.loot_tiles = {}  # Every Tile with loot on it, used as an ordered set
+        self.camera = camera.Camera(system.SCREEN_SIZE, (self.size[0] * TILE_SIZE, self.size[1] * TILE_SIZE))
+        # Blocks of the floor with every Tile sprite already drawn onto them, made by bake_block()
+        # Maps (column, row) in blocks to the Surface, ordered from least to most recently drawn
+        self.blocks = {}
+        self.spare_floor = None  # Copy of the floor made by the Layout, used for the first block baked
+        self.changed_rects = []  # Areas of the background redrawn since the last frame, for dirty rendering
+        self.next_layout = None  # Future for the next Room's Layout while it is generated in the background
+        self.next_seed = None  # The seed the next Room's Layout is made from
+        if state is not None:
+            self.swarm.set_state(state['swarm'], creatures.ENEMIES)
+        self.generate(layout, state and state['world'])
+
+    def generate(self, layout, state=None):
         """
         Generates the tileset of obstacles and traps then generates Enemies
-        Based on noise mapping from map.py
-        """
-        TILES.clear()  # Resets the TILES array every time a new Room is created
-        map.generate_map()  # Generates the ENEMY_MAP and OBSTACLE_MAP every time a new Room is created
-        openList = []  # List of all possible coordinates for the Door
-        for x in range(24):
-            column = []
-            for y in range(15):
-                if [x, y] in map.OBSTACLE_MAP:
-                    if random.randint(1, 10) == 1:  # 10% chance for a Barrel to become a Trap
-                        tile = Trap(x * 70, y * 70, x, y, self)
-                    else:
-                        tile = Barrel(x * 70, y * 70, x, y, self)
-                else:
-                    if x == 23 or x == 0 or y == 0 or y == 14:
-                        # Adds non-occupied Tiles from the border to the openList
-                        openList.append([x, y])
-                    tile = Tile(x * 70, y * 70, x, y, self)
-                column.append(tile)
-            TILES.append(column)
-
-        doorCoord = random.choice(openList)  # Picks a random coordinate from the openList for the Door
-        self.door = Door(doorCoord[0] * 70, doorCoord[1] * 70, doorCoord[0], doorCoord[1], self)
-        TILES[doorCoord[0]][doorCoord[1]] = self.door  # Door added to TILES
-
-        # Adds Enemies to the Room
-        enemy_count = 0
-        for coords in map.ENEMY_MAP:
-            enemy = creatures.Factory('Slime', coords[0] * 70 + 35, coords[1] * 70 + 35, 1)
-            self.enemies.append(enemy)
-            enemy_count += 1
-            if enemy_count == 12:  # Caps number of Enemies at 12 to save processing power and not overwhelm Player
-                break
-
-    def draw_creatures(self):
+        Based on noise mapping from map.py, given by the Layout
+        Only the chunks near the Player and the Door are made now, the rest are made as the Player explores
+        :param layout: The Layout to build the Room from
+        :param state: Dict from World.get_state() to load the chunks of a saved Room
+        """
+        global LAYOUT_VERSION, TILES
+        LAYOUT_VERSION += 1
+        TILES = world.World(self, layout, state=state)  # Replaces the Tiles of the last Room
+        TILES.update(*system.PLAYER.get_hitbox().center)  # Makes the chunks around the Player
+        TILES.get_tile(*layout.door)  # Makes the Door, which is always kept loaded
+        self.bake(layout.floor)
+
+    def prefetch(self, seed=None):
+        """
+        Starts generating the next Room's Layout in the background while this Room is played,
+        so next_room() only has to build the Tiles and Enemies
+        The Player arrives in the next Room where this Room's Door is, so the chunks there are made too
+        The seed is picked here on the main thread, so a seeded run always gets the same Rooms
+        :param seed: The seed to make the Layout from, picked at random if not given, e.g. from a saved run
+        """
+        self.next_seed = streams.get('rooms').getrandbits(32) if seed is None else seed
+        self.next_layout = WORKER.submit(Layout, random.Random(self.next_seed), self.size,
+                                         self.door.get_map_coords())
+
+    def get_state(self) -> dict:
+        """
+        Used to save a run, holds only plain data so it can be written to a file
+        :return: Dict of everything needed to carry on the Room
+        """
+        return {
+            'difficulty': self.difficulty,
+            'layout': self.layout.get_state(),
+            'next_seed': self.next_seed,
+            'world': TILES.get_state(),
+            'swarm': self.swarm.get_state(),
+        }
+
+    def bake(self, floor=None):
+        """
+        Bakes the blocks of background that are on screen when the Room starts, so the first frame doesn't have to
+        Nothing is drawn when running headless
+        :param floor: A copy of the floor to bake the first block onto, one is made if not given
+        """
+        if system.HEADLESS:
+            return
+        self.spare_floor = floor
+        self.camera.follow(*system.PLAYER.get_hitbox().center)
+        for column, row in self.get_blocks_touching(self.camera.get_rect()):
+            self.get_block(column, row)
+
+    def bake_block(self, column: int, row: int) -> pygame.Surface:
+        """
+        Draws the floor and every Tile sprite touching one block of the Room onto one surface,
+        so the static parts of the Room can be drawn each frame with a few blits
+        :param column: The block's column, counted in blocks
+        :param row: The block's row, counted in blocks
+        :return: The baked block
+        """
+        area = get_block_rect(column, row)
+        if self.spare_floor is not None:
+            block = self.spare_floor
+            self.spare_floor = None
+        else:
+            block = get_floor().copy()
+        for tile in self.get_sprites_touching(area):
+            block.blit(tile.return_sprite(), (tile.x - area.x, tile.y - area.y))
+        return block
+
+    def get_block(self, column: int, row: int) -> pygame.Surface:
+        """
+        Blocks are only baked the first time they are needed, past MAX_BLOCKS the least recently drawn is dropped
+        :param column: The block's column, counted in blocks
+        :param row: The block's row, counted in blocks
+        :return: The baked block of background
+        """
+        block = self.blocks.pop((column, row), None)
+        if block is None:
+            block = self.bake_block(column, row)
+            if len(self.blocks) >= MAX_BLOCKS:
+                del self.blocks[next(iter(self.blocks))]
+        self.blocks[(column, row)] = block  # Moves the block to the end, as the most recently drawn
+        return block
+
+    def get_blocks_touching(self, area: pygame.Rect) -> list:
+        """
+        :param area: The area to check, in pixels
+        :return: The (column, row) of every block of background inside the Room that overlaps the area
+        """
+        area = area.clip(self.camera.world)
+        if not area:
+            return []
+        return [(column, row)
+                for column in range(area.left // BLOCK_SIZE[0], (area.right - 1) // BLOCK_SIZE[0] + 1)
+                for row in range(area.top // BLOCK_SIZE[1], (area.bottom - 1) // BLOCK_SIZE[1] + 1)]
+
+    def redraw_tile(self, tile):
+        """
+        Updates the background after a Tile's sprite has changed
+        Sprites overlap neighbouring Tiles, so every sprite touching the area is redrawn in the original order
+        Only blocks that have already been baked are changed, the rest will be baked with the new sprite
+        :param tile: The Tile whose sprite changed
+        """
+        if self.blocks:  # Nothing is baked when running headless
+            self.redraw(tile.return_sprite().get_rect(topleft=tile.get_coords()))
+
+    def redraw_area(self, area: tuple):
+        """
+        Updates the background after a chunk has been loaded, as blocks baked before it was don't have its sprites
+        :param area: The Tiles the chunk covers, as (first column, first row, last column + 1, last row + 1)
+        """
+        if self.blocks:
+            # Sprites are never more than one Tile bigger than their Tile, so can stick out of the chunk by one Tile
+            self.redraw(pygame.Rect((area[0] - 1) * TILE_SIZE, (area[1] - 1) * TILE_SIZE,
+                                    (area[2] - area[0] + 2) * TILE_SIZE, (area[3] - area[1] + 2) * TILE_SIZE))
+
+    def redraw(self, area: pygame.Rect):
+        """
+        Redraws the floor and every sprite touching an area of the baked blocks, in the original order
+        :param area: The area to redraw, in pixels
+        """
+        sprites = self.get_sprites_touching(area)
+        for (column, row), block in self.blocks.items():
+            block_rect = get_block_rect(column, row)
+            if not block_rect.colliderect(area):
+                continue
+            local = area.move(-block_rect.x, -block_rect.y)
+            block.set_clip(local)
+            block.blit(get_floor(), local, local)
+            for other in sprites:
+                block.blit(other.return_sprite(), (other.x - block_rect.x, other.y - block_rect.y))
+            block.set_clip(None)
+        self.changed_rects.append(area)
+
+    def draw_background(self, area=None):
+        """
+        Draws the baked background to the screen, only drawing the blocks that are on screen
+        :param area: The area of the screen to draw, in screen pixels, defaults to the whole screen
+        """
+        view = self.camera.get_rect()
+        if area is None:
+            area = pygame.Rect((0, 0), view.size)
+        world_area = area.move(view.topleft)
+        if not self.camera.world.contains(world_area):
+            system.WIN.fill((0, 0, 0), area)  # Clears the empty space around a Room that is smaller than the screen
+        for column, row in self.get_blocks_touching(world_area):
+            block_rect = get_block_rect(column, row)
+            overlap = world_area.clip(block_rect).clip(self.camera.world)  # Blocks at the edges stick out of the Room
+            system.WIN.blit(self.get_block(column, row), self.camera.to_screen(overlap),
+                            overlap.move(-block_rect.x, -block_rect.y))
+
+    def get_sprites_touching(self, area: pygame.Rect, after=None) -> list:
+        """
+        :param area: The area to check, in pixels
+        :param after: If given, only Tiles after this Tile in column order are included
+        :return: All the Tiles with a sprite that overlaps the area, in the order they are drawn
+        """
+        tiles = []
+        # Sprites are drawn from the Tile's top left and are never more than one Tile bigger than it
+        span = get_tile_span(area)
+        for column in range(max(span[0] - 1, 0), min(span[2] + 1, TILES.columns)):
+            for row in range(max(span[1] - 1, 0), min(span[3] + 1, TILES.rows)):
+                if after is not None and (column, row) <= (after.get_column(), after.get_row()):
+                    continue
+                # Drawing never loads chunks, their sprites are added to the baked blocks once they are loaded
+                kind = TILES.get_loaded_kind(column, row)
+                if kind is None or kind == world.FLOOR:
+                    continue  # Only the other kinds have sprites, checked first so no Tile object has to be made
+                tile = TILES.get_loaded(column, row)
+                if tile.return_sprite() is not None and \
+                        tile.return_sprite().get_rect(topleft=tile.get_coords()).colliderect(area):
+                    tiles.append(tile)
+        return tiles
+
+    def draw_obstacles(self, full=True) -> list:
+        """
+        Method that draws all obstacle sprites and dropped loot to their respective locations
+        Only the parts of the Room inside the Camera's view are drawn
+        :param full: If False, only the loot and changed sprites are drawn as the background is already on screen
+        :return: The areas of the screen that changed since the last frame, for dirty rendering
+        """
+        view = self.camera.get_rect()
+        offset_x, offset_y = self.camera.get_offset()
+        if full:
+            self.draw_background()
+        dirty = []
+        for rect in self.changed_rects:
+            if rect.colliderect(view):
+                dirty.append(self.camera.to_screen(rect))
+                if not full:
+                    self.draw_background(dirty[-1])
+        self.changed_rects = []
+
+        # Loot is never more than a Tile away from the Tile it was dropped on
+        near = view.inflate(4 * TILE_SIZE, 4 * TILE_SIZE)
+        visible = [tile for tile in self.loot_tiles if near.colliderect(tile.get_hitbox())]
+        for tile in sorted(visible, key=lambda loot_tile: loot_tile.get_map_coords()):
+            for item in tile.get_loot():
+                if isinstance(item, items.Gold) and view.inflate(20, 20).collidepoint(item.get_coords()):
+                    rect = pygame.draw.circle(system.WIN, (255, 215, 0),
+                                              (item.get_coords()[0] + offset_x, item.get_coords()[1] + offset_y), 10)
+                    dirty.append(rect)
+                    # Sprites of later Tiles used to be drawn over the loot, so they are redrawn on top of it
+                    system.WIN.set_clip(rect)
+                    for other in self.get_sprites_touching(rect.move(view.topleft), tile):
+                        system.WIN.blit(other.return_sprite(), (other.x + offset_x, other.y + offset_y))
+                    system.WIN.set_clip(None)
+        return dirty
+
+    def update(self):
+        """
+        Moves every live Enemy towards the Player and moves their animations on, called once per tick
+        Also loads the chunks the Player has moved close to
+        """
+        TILES.update(*system.PLAYER.get_hitbox().center)
+        player_tile = system.PLAYER.get_tile()
+        self.flow_field.update(player_tile)  # Only rebuilds if the Player has moved to another Tile
+        self.swarm.update(player_tile, self.flow_field)
+
+    def draw_creatures(self, alpha=1.0) -> list:
         """
         Method that draws all creatures in the level to their respective locations
+        :param alpha: How far through the current tick the frame is, creatures are drawn between their
+        last and current positions so movement looks smooth at any frame rate
+        :return: The areas of the screen that were drawn to, for dirty rendering
         """
+        dirty = []
+        view = self.camera.get_rect()
+        camera_x, camera_y = self.camera.get_offset()
 
         # Draws the Player sprite
-        system.WIN.blit(system.PLAYER.return_sprite(), system.PLAYER.get_coords())
-        # Draws all Enemy sprites
-        for enemy in self.enemies:
-            if not enemy.is_dead():  # Doesn't draw dead Enemies
-                enemy.move(system.PLAYER.get_tile())
-                sprite = enemy.return_sprite()
-                coords = enemy.get_coords()
-                system.WIN.blit(sprite, coords)
-                # Draws Enemy health bars
-                pygame.draw.rect(system.WIN, (255, 0, 0), enemy.get_health_bar()[0])
-                pygame.draw.rect(system.WIN, (0, 255, 0), enemy.get_health_bar()[1])
-
+        offset = system.PLAYER.get_draw_offset(alpha)
+        coords = system.PLAYER.get_coords()
+        dirty.append(system.WIN.blit(system.PLAYER.return_sprite(),
+                                     (coords[0] + offset[0] + camera_x, coords[1] + offset[1] + camera_y)))
+        # Draws the Enemy sprites in view, Enemies elsewhere in the Room are skipped by the Swarm
+        # Sprites stick out of the hitbox by up to 2 Tiles, and are drawn in the order the Enemies were added
+        for sprite, coords, under_bar, health_bar in self.swarm.get_sprites(
+                view.inflate(4 * TILE_SIZE, 4 * TILE_SIZE), alpha):
+            area = sprite.get_rect(topleft=coords)
+            if not view.colliderect(area):
+                continue
+            dirty.append(system.WIN.blit(sprite, self.camera.to_screen(area)))
+            # Draws Enemy health bars
+            dirty.append(pygame.draw.rect(system.WIN, (255, 0, 0), self.camera.to_screen(under_bar)))
+            pygame.draw.rect(system.WIN, (0, 255, 0), self.camera.to_screen(health_bar))
+
+        return dirty
+
+    @staticmethod
+    def draw_hud() -> list:
+        """
+        Draws the Player's health bar, ability cooldowns and gold over the top of the Room
+        :return: The areas of the screen that were drawn to, for dirty rendering
+        """
+        dirty = []
         # Draws the Player healthbar
-        pygame.draw.rect(system.WIN, (255, 255, 255), (7, 977,  406, 66))
+        dirty.append(pygame.draw.rect(system.WIN, (255, 255, 255), (7, 977,  406, 66)))
         pygame.draw.rect(system.WIN, (255, 0, 0), (10, 980, 400, 60))
         pygame.draw.rect(system.WIN, (0, 255, 0), system.PLAYER.get_healthbar())
         # Draws cooldown circles
         for i, values in enumerate(system.PLAYER.get_cooldowns().values()):
-            pygame.draw.circle(system.WIN, (255, 255, 255), (1600 - 90 * i, 990), 40)
+            dirty.append(pygame.draw.circle(system.WIN, (255, 255, 255), (1600 - 90 * i, 990), 40))
             if values[0] >= values[1]:
                 pygame.draw.circle(system.WIN, (0, 0, 255), (1600 - 90 * i, 990), 35)
 
         # Draws gold count
         gold_text = FONT.render(str(system.PLAYER.get_gold()), True, (255, 215, 0))
-        pygame.draw.circle(system.WIN, (255, 215, 0), (1550, 50), 20)
-        system.WIN.blit(gold_text, (1580, 38))
+        dirty.append(pygame.draw.circle(system.WIN, (255, 215, 0), (1550, 50), 20))
+        dirty.append(system.WIN.blit(gold_text, (1580, 38)))
+
+        return dirty
 
     def draw_enemy_hitboxes(self):
         """
-        Debugging method that draws all enemy hitboxes as green rectangles
+        Debugging method that draws the hitboxes of the enemies on screen as green rectangles
+        """
+        for enemy in self.get_enemies_in(self.camera.get_rect()):
+            pygame.draw.rect(system.WIN, (0, 255, 0), self.camera.to_screen(enemy.get_hitbox()))
+            for tile in astar.get_path(enemy.get_tile(), system.PLAYER.get_tile()):
+                pygame.draw.rect(system.WIN, (50, 50, 50), self.camera.to_screen(tile.get_hitbox()))
+
+    def get_enemies_at(self, column: int, row: int) -> list:
+        """
+        :param column: The Tile's column
+        :param row: The Tile's row
+        :return: A list of all the live Enemies whose hitbox touches the Tile
+        """
+        return self.swarm.get_enemies_at(column, row)
+
+    def get_enemies_in(self, rect: pygame.Rect) -> list:
+        """
+        :param rect: The area to search, in pixels
+        :return: A list of all the live Enemies whose hitbox touches the rectangle
         """
-        for enemy in self.enemies:
-            pygame.draw.rect(system.WIN, (0, 255, 0), enemy.get_hitbox())
-            for tile in astar.astar(enemy.get_tile(), system.PLAYER.get_tile()):
-                pygame.draw.rect(system.WIN, (50, 50, 50), tile.get_hitbox())
+        return [self.swarm.enemies[index] for index in self.swarm.get_indices_in(rect).tolist()]
 
     def get_enemies(self) -> list:
         """
         :return: A list of all the live Enemies in the Room
         """
-        temp = []
-        for enemy in self.enemies:
-            if not enemy.is_dead():
-                temp.append(enemy)
-        return temp
+        return self.swarm.get_living()
 
     def check_win(self) -> bool:
         """
         Method to check if the Player has 'beaten' the level or not
         :return: True if all Enemeies are dead, False otherwise
         """
-        if any(not enemy.is_dead() for enemy in self.enemies):
+        if not self.swarm.is_clear() or TILES.get_unspawned():  # Enemies in unexplored chunks count too
             return False
         else:
             if not self.door.is_open():
@@ -418,11 +870,16 @@ class Room:
 
     def next_room(self):
         """
-        Method that creates the next Room in the run
+        Method that creates the next Room in the run, from the Layout started by prefetch()
+        The new Room starts generating the Room after it straight away
         :return: A new Room object with higher difficulty
         """
         system.PLAYER.heal(int(50 * self.difficulty))  # Heals the Player slightly between Rooms
-        return Room(self.difficulty + 0.5)
+        if self.next_layout is None:
+            self.prefetch()
+        room = Room(self.difficulty + DIFFICULTY_STEP, self.next_layout.result())  # Only waits if the Layout isn't done yet
+        room.prefetch()
+        return room
 
     def get_door(self) -> Door:
         """
@@ -0,0 +1,146 @@
+import io
+import os
+import pickle
+import random
+import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+import system
+import rooms
+import streams
+
+PATH = 'save'  # The file the run in progress is saved to, next to the Player's data file
+MAGIC = b'NEAS'  # Start of every save file, so other files are never loaded by mistake
+FORMAT_VERSION = 3  # Increased whenever what is saved changes, saves from other versions aren't loaded
+HEADER = struct.Struct('<4sH')  # MAGIC then FORMAT_VERSION
+AUTOSAVE_SECONDS = 30  # Time between autosaves while a run is being played
+WRITER = ThreadPoolExecutor(max_workers=1)  # Saves are written one at a time, in the order they were made
+
+
+class Unpickler(pickle.Unpickler):
+    def find_class(self, module, name):
+        """
+        Save files only hold plain data like dicts, lists and bytes, so loading one can never run any code
+        """
+        raise pickle.UnpicklingError('Save files can not hold {}.{}'.format(module, name))
+
+
+def get_state(game) -> dict:
+    """
+    Copies everything about the current run, on the main thread so nothing changes part way through
+    :param game: The running system.System
+    :return: Dict of plain data, can be written by encode() from any thread
+    """
+    return {
+        'room_size': game.room_size,
+        'random': random.getstate(),  # Saved runs carry on exactly as they would have
+        'streams': streams.get_state(),
+        'player': system.PLAYER.get_state(),
+        'room': game.current_room.get_state(),
+    }
+
+
+def encode(state: dict) -> bytes:
+    """
+    :param state: Dict from get_state()
+    :return: The save file's contents, a header then the compressed state
+    """
+    return HEADER.pack(MAGIC, FORMAT_VERSION) + zlib.compress(pickle.dumps(state, pickle.HIGHEST_PROTOCOL))
+
+
+def decode(data: bytes) -> dict:
+    """
+    :param data: The contents of a save file
+    :return: The state it holds
+    :raises ValueError: If the file isn't a save or was made by another FORMAT_VERSION
+    """
+    if len(data) < HEADER.size:
+        raise ValueError('Save file is too short')
+    magic, version = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError('Not a save file')
+    if version != FORMAT_VERSION:
+        raise ValueError('Save file is version {}, only version {} can be loaded'.format(version, FORMAT_VERSION))
+    try:
+        return Unpickler(io.BytesIO(zlib.decompress(data[HEADER.size:]))).load()
+    except (zlib.error, pickle.UnpicklingError, EOFError) as error:
+        raise ValueError('Save file is damaged: {}'.format(error))
+
+
+def write(state: dict, path: str):
+    """
+    Writes a save so that the file is always either the old save or the new one, even if the game crashes
+    The new save is written to a temporary file which then replaces the old one in one step
+    :param state: Dict from get_state()
+    :param path: The file to save to
+    """
+    temp = path + '.tmp'
+    with open(temp, 'wb') as file:
+        file.write(encode(state))
+        file.flush()
+        os.fsync(file.fileno())  # Makes sure the data is on disk before the old save is replaced
+    os.replace(temp, path)
+
+
+def save(game, path=PATH):
+    """
+    Saves the current run, only copying the state on this thread so the frame isn't held up
+    :param game: The running system.System
+    :param path: The file to save to
+    :return: Future that is done once the save has been written
+    """
+    return WRITER.submit(write, get_state(game), path)
+
+
+def load(path=PATH):
+    """
+    :param path: The file to load from
+    :return: The state of the saved run, None if there isn't one
+    :raises ValueError: If the file isn't a save or was made by another FORMAT_VERSION
+    """
+    try:
+        with open(path, 'rb') as file:
+            return decode(file.read())
+    except FileNotFoundError:
+        return None
+
+
+def restore(game, state: dict):
+    """
+    Carries on a saved run from where it was saved
+    :param game: The system.System to carry the run on in
+    :param state: Dict from get_state() or load()
+    :raises ValueError: If the state isn't laid out like one from get_state(), the Player is left as it was
+    """
+    room_size = game.room_size
+    player = system.PLAYER.get_state()
+    try:
+        game.room_size = tuple(state['room_size'])
+        system.PLAYER.set_state(state['player'])  # The Room loads the chunks around the Player, so goes first
+        game.current_room = rooms.Room(None, state=state['room'])
+        game.current_room.prefetch(state['room']['next_seed'])
+        random.setstate(state['random'])
+        streams.set_state(state['streams'])
+    except (KeyError, IndexError, TypeError, AttributeError, ValueError) as error:
+        # A save can decode fine but still not hold what a run needs, e.g. if it was edited
+        game.room_size = room_size
+        system.PLAYER.set_state(player)
+        raise ValueError('Save file is damaged: {!r}'.format(error))
+    game.full_redraw = True
+
+
+def wait():
+    """
+    Blocks until every save that has been started is written, e.g. before the game closes
+    """
+    WRITER.submit(lambda: None).result()
+
+
+def delete(path=PATH):
+    """
+    Removes the save once a run is over, waiting for any save still being written first
+    :param path: The file to remove
+    """
+    wait()
+    if os.path.exists(path):
+        os.remove(path)
@@ -0,0 +1,53 @@
+import random
+
+# The parts of the game that use random numbers, each gets its own stream once a run is seeded
+# so that e.g. an extra loot drop doesn't change the layout of every Room after it
+NAMES = ('rooms', 'enemies', 'loot')
+STREAMS = {}  # Maps each name to its random.Random, empty until seed() is called
+
+
+def seed(run_seed: int):
+    """
+    Gives every part of the game its own random number generator, all made from one seed
+    The same seed and the same input always play out the same way
+    :param run_seed: The seed for the run
+    """
+    STREAMS.clear()
+    for name in NAMES:
+        STREAMS[name] = random.Random('{} {}'.format(run_seed, name))
+
+
+def unseed():
+    """
+    Goes back to every part of the game sharing the random module
+    """
+    STREAMS.clear()
+
+
+def get(name: str):
+    """
+    :param name: One of NAMES
+    :return: The stream's random.Random, or the random module if the run hasn't been seeded
+    """
+    return STREAMS.get(name, random)
+
+
+def get_state():
+    """
+    Used to save a run
+    :return: Maps each name to the state of its stream, None if the run hasn't been seeded
+    """
+    if not STREAMS:
+        return None
+    return {name: stream.getstate() for name, stream in STREAMS.items()}
+
+
+def set_state(state):
+    """
+    :param state: Dict from get_state(), or None to unseed
+    """
+    STREAMS.clear()
+    if state is not None:
+        for name, stream_state in state.items():
+            STREAMS[name] = random.Random()
+            STREAMS[name].setstate(stream_state)
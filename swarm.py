@@ -0,0 +1,467 @@
+import numpy as np
+import pygame
+import items
+import rooms
+import streams
+import system
+
+# The animations every Enemy has, in the order they are stored in the state and frame arrays
+STATES = ('move_right', 'move_left', 'attack_right', 'attack_left')
+MOVE_RIGHT, MOVE_LEFT, ATTACK_RIGHT, ATTACK_LEFT = range(len(STATES))
+# The state each state changes to when an Enemy reaches the Player, moving right turns to attack left and vice versa
+ATTACK_TURNS = np.array([ATTACK_LEFT, ATTACK_RIGHT, ATTACK_RIGHT, ATTACK_LEFT])
+HEALTH_BAR_SIZE = (50, 10)  # Width and height of the health bar drawn above each Enemy
+# The arrays saved by get_state(), the rest are found again from these after loading
+SAVED_ARRAYS = ('x', 'y', 'dx', 'dy', 'width', 'height', 'speed', 'health', 'max_health', 'damage', 'difficulty',
+                'kind', 'colour', 'state', 'frames', 'frame_speeds', 'frame_limits', 'grid_spans', 'registered')
+
+
+def round_half_away(values: np.ndarray) -> np.ndarray:
+    """
+    Rounds the same way as assigning a float to a pygame.Rect attribute, halves are rounded away from zero
+    :param values: float array
+    :return: int array of the rounded values
+    """
+    whole = np.trunc(values)
+    return (whole + np.sign(values) * (np.abs(values - whole) >= 0.5)).astype(np.int64)
+
+
+class Swarm:
+    def __init__(self, capacity=16):
+        """
+        Class that holds every Enemy in a Room as a struct of arrays rather than one object per Enemy
+        Every tick the Enemies are moved, animated and checked for attacks with one numpy pass each,
+        so the cost of a tick grows very slowly with the number of Enemies
+        Enemy objects are views of one index of the arrays, for code that only deals with a few Enemies
+        :param capacity: The number of Enemies space is made for at first, doubles whenever it runs out
+        """
+        self.count = 0  # Number of Enemies, only the first count entries of each array are used
+        self.enemies = []  # The Enemy view for each index, in the order the Enemies were added
+        self.kinds = []  # The Enemy subclass of each kind added so far, the kind array holds indexes into it
+        self.sheets = {}  # Maps (kind, colour) to its Spritesheets in STATES order, shared by all Enemies that match
+        self.sprite_offsets = np.zeros((0, len(STATES), 2), np.int64)  # (x, y) from hitbox to sprite for each kind
+
+        self.x = np.zeros(capacity, np.int64)  # Top left of each hitbox
+        self.y = np.zeros(capacity, np.int64)
+        self.dx = np.zeros(capacity, np.int64)  # Distance moved in the last tick, used to draw between ticks
+        self.dy = np.zeros(capacity, np.int64)
+        self.width = np.zeros(capacity, np.int64)  # Size of each hitbox
+        self.height = np.zeros(capacity, np.int64)
+        self.speed = np.zeros(capacity, np.int64)  # Pixels moved per tick
+        self.health = np.zeros(capacity, np.int64)
+        self.max_health = np.zeros(capacity, np.int64)
+        self.damage = np.zeros(capacity, np.int64)
+        self.difficulty = np.zeros(capacity, np.float64)
+        self.kind = np.zeros(capacity, np.int64)
+        self.colour = np.zeros(capacity, np.int64)  # Index into the kind's colours
+        self.state = np.zeros(capacity, np.int64)  # Index into STATES
+        # Every animation keeps its own frame count, like each Spritesheet used to
+        self.frames = np.zeros((capacity, len(STATES)), np.int64)
+        self.frame_speeds = np.zeros((capacity, len(STATES)), np.int64)  # Ticks each frame is shown for
+        self.frame_limits = np.zeros((capacity, len(STATES)), np.int64)  # Frame count that loops back to 0
+
+        # The Tile each Enemy is on and the span of Tiles and LAYOUT_VERSION it was found for
+        self.tiles = []
+        self.tile_columns = np.full(capacity, -1, np.int64)  # -1 if the Enemy has no Tile
+        self.tile_rows = np.full(capacity, -1, np.int64)
+        self.tile_spans = np.zeros((capacity, 4), np.int64)
+        self.tile_versions = np.full(capacity, -1, np.int64)
+
+        # Spatial hash of Enemies, maps each (column, row) to the Enemies touching it
+        # Dicts are used as ordered sets so lookups always return Enemies in the same order
+        self.grid = {}
+        self.grid_spans = np.zeros((capacity, 4), np.int64)  # The Tiles each Enemy is registered to
+        self.registered = np.zeros(capacity, bool)  # If each Enemy is in the spatial hash
+
+    def grow(self):
+        """
+        Doubles the space in every array, keeping the Enemies already added
+        """
+        for name, array in list(vars(self).items()):
+            if isinstance(array, np.ndarray) and name != 'sprite_offsets':
+                bigger = np.zeros((len(array) * 2,) + array.shape[1:], array.dtype)
+                if name in ('tile_columns', 'tile_rows', 'tile_versions'):
+                    bigger.fill(-1)
+                bigger[:self.count] = array[:self.count]
+                setattr(self, name, bigger)
+
+    def add(self, enemy, x: int, y: int, difficulty) -> int:
+        """
+        Adds an Enemy to the arrays, called by Enemy.__init__
+        :param enemy: The new Enemy view, its class holds the stats for its kind
+        :param x: x-coord of the centre of the hitbox
+        :param y: y-coord of the centre of the hitbox
+        :param difficulty: Scalar to increase the Enemy's health and damage
+        :return: The Enemy's index
+        """
+        kind = type(enemy)
+        if kind not in self.kinds:
+            self.kinds.append(kind)
+            self.sprite_offsets = np.append(self.sprite_offsets, [kind.sprite_offsets], axis=0)
+        colour = streams.get('enemies').choice(kind.colours)
+        sheets = self.get_sheets(kind, colour)
+
+        if self.count == len(self.x):
+            self.grow()
+        index = self.count
+        self.count += 1
+        self.enemies.append(enemy)
+        self.tiles.append(None)
+        self.tile_versions[index] = -1  # Spaces can be reused after truncate(), so nothing is left from before
+        self.dx[index] = self.dy[index] = 0
+        self.frames[index] = 0
+
+        self.width[index], self.height[index] = kind.size
+        self.x[index] = x - kind.size[0] // 2  # Centres the hitbox on the given point
+        self.y[index] = y - kind.size[1] // 2
+        self.speed[index] = kind.speed
+        self.max_health[index] = self.health[index] = int(kind.health * difficulty)  # Health scales with difficulty
+        self.damage[index] = int(kind.damage * difficulty)  # Damage scales with difficulty
+        self.difficulty[index] = difficulty
+        self.kind[index] = self.kinds.index(kind)
+        self.colour[index] = kind.colours.index(colour)
+        self.state[index] = MOVE_LEFT
+        self.frame_speeds[index] = [sheet.speed for sheet in sheets]
+        self.frame_limits[index] = [sheet.length * sheet.speed for sheet in sheets]
+        self.animate(np.array([index]))
+        self.register(index, self.get_spans(np.array([index]))[0].tolist())
+        return index
+
+    def get_sheets(self, kind, colour: str) -> list:
+        """
+        :param kind: An Enemy subclass
+        :param colour: One of the kind's colours
+        :return: The kind's Spritesheets for the colour in STATES order, made the first time they are asked for
+        """
+        sheets = self.sheets.get((kind, colour))
+        if sheets is None:
+            spritesheets = kind.get_spritesheets(colour)
+            sheets = self.sheets[(kind, colour)] = [spritesheets[state] for state in STATES]
+        return sheets
+
+    def get_state(self) -> dict:
+        """
+        Used to save a run, holds only plain data so it can be written to a file
+        :return: Dict of every Enemy's arrays as (dtype, shape, bytes), the names of the kinds
+        and the order of the spatial hash, which decides the order Enemies are hit in
+        """
+        arrays = {}
+        for name in SAVED_ARRAYS:
+            array = getattr(self, name)[:self.count]
+            arrays[name] = (array.dtype.str, array.shape, array.tobytes())
+        return {
+            'count': self.count,
+            'kinds': [kind.__name__ for kind in self.kinds],
+            'arrays': arrays,
+            'grid': [(cell, [enemy.index for enemy in enemies]) for cell, enemies in self.grid.items()],
+        }
+
+    def set_state(self, state: dict, kinds: dict):
+        """
+        Replaces every Enemy with the ones from get_state()
+        Tiles are found again on the next update, as they depend on which chunks are loaded
+        :param state: Dict from get_state()
+        :param kinds: Maps the name of each Enemy subclass to the class
+        """
+        self.truncate(0)
+        self.grid = {}
+        self.kinds = [kinds[name] for name in state['kinds']]
+        self.sprite_offsets = np.array([kind.sprite_offsets for kind in self.kinds], np.int64).reshape(
+            (len(self.kinds), len(STATES), 2))
+        while len(self.x) < state['count']:
+            self.grow()
+        for name, (dtype, shape, data) in state['arrays'].items():
+            getattr(self, name)[:shape[0]] = np.frombuffer(data, dtype).reshape(shape)
+        self.count = state['count']
+        self.tile_versions[:self.count] = -1
+
+        for index in range(self.count):
+            kind = self.kinds[self.kind[index]]
+            self.get_sheets(kind, kind.colours[self.colour[index]])
+            self.enemies.append(kind(self, 0, 0, 0, index))
+            self.tiles.append(None)
+        for cell, indices in state['grid']:
+            self.grid[tuple(cell)] = dict.fromkeys(self.enemies[index] for index in indices)
+
+    def truncate(self, count: int):
+        """
+        Removes every Enemy after the first count
+        :param count: The number of Enemies to keep
+        """
+        for index in range(count, self.count):
+            self.unregister(index)
+        del self.enemies[count:]
+        del self.tiles[count:]
+        self.count = min(self.count, count)
+
+    def get_spans(self, indices: np.ndarray) -> np.ndarray:
+        """
+        :param indices: The Enemies to check
+        :return: (column, row, last column, last row) of the Tiles touched by each Enemy's hitbox,
+        the same as rooms.get_tile_span for every Enemy at once
+        """
+        x = self.x[indices]
+        y = self.y[indices]
+        return np.stack((x, y, x + self.width[indices] - 1, y + self.height[indices] - 1), axis=1) // rooms.TILE_SIZE
+
+    def set_tile(self, index: int, span: list):
+        """
+        Finds the Tile an Enemy is on again, the first traversable Tile its hitbox touches
+        :param index: The Enemy's index
+        :param span: The Tiles touched by the Enemy's hitbox
+        """
+        tile = rooms.get_free_tile(tuple(span))
+        self.tiles[index] = tile
+        self.tile_spans[index] = span
+        self.tile_versions[index] = rooms.LAYOUT_VERSION
+        if tile is None:
+            self.tile_columns[index] = self.tile_rows[index] = -1
+        else:
+            self.tile_columns[index] = tile.get_column()
+            self.tile_rows[index] = tile.get_row()
+
+    def update_tiles(self, indices: np.ndarray, spans=None):
+        """
+        Only looks the Tile up again for Enemies that have crossed a Tile boundary or if the Room has changed
+        :param indices: The Enemies to update
+        :param spans: The Enemies' spans from get_spans, if they have already been worked out
+        """
+        if spans is None:
+            spans = self.get_spans(indices)
+        stale = (spans != self.tile_spans[indices]).any(axis=1) | (self.tile_versions[indices] != rooms.LAYOUT_VERSION)
+        for index, span in zip(indices[stale].tolist(), spans[stale].tolist()):
+            self.set_tile(index, span)
+
+    def get_tile(self, index: int):
+        """
+        :param index: The Enemy's index
+        :return: The Tile the Enemy is on, None if its hitbox doesn't touch a traversable loaded Tile
+        """
+        # Works on plain ints, as numpy is slow for one Enemy at a time
+        x, y = int(self.x[index]), int(self.y[index])
+        span = [x // rooms.TILE_SIZE, y // rooms.TILE_SIZE, (x + int(self.width[index]) - 1) // rooms.TILE_SIZE,
+                (y + int(self.height[index]) - 1) // rooms.TILE_SIZE]
+        if self.tile_versions[index] != rooms.LAYOUT_VERSION or self.tile_spans[index].tolist() != span:
+            self.set_tile(index, span)
+        return self.tiles[index]
+
+    def register(self, index: int, span: list):
+        """
+        Moves an Enemy to the right cells of the spatial hash
+        :param index: The Enemy's index
+        :param span: The Tiles touched by the Enemy's hitbox
+        """
+        self.unregister(index)
+        enemy = self.enemies[index]
+        for column in range(span[0], span[2] + 1):
+            for row in range(span[1], span[3] + 1):
+                self.grid.setdefault((column, row), {})[enemy] = None
+        self.grid_spans[index] = span
+        self.registered[index] = True
+
+    def unregister(self, index: int):
+        """
+        Removes an Enemy from the spatial hash
+        :param index: The Enemy's index
+        """
+        if not self.registered[index]:
+            return
+        self.registered[index] = False
+        enemy = self.enemies[index]
+        column, row, last_column, last_row = self.grid_spans[index].tolist()
+        for column in range(column, last_column + 1):
+            for row in range(row, last_row + 1):
+                cell = self.grid[(column, row)]
+                del cell[enemy]
+                if not cell:
+                    del self.grid[(column, row)]
+
+    def animate(self, indices: np.ndarray):
+        """
+        Moves each Enemy's current animation on by one frame, looping back to the start at the end
+        :param indices: The Enemies to animate
+        """
+        states = self.state[indices]
+        frames = self.frames[indices, states] + 1
+        frames[frames == self.frame_limits[indices, states]] = 0
+        self.frames[indices, states] = frames
+
+    def update(self, player_tile, field):
+        """
+        Moves every live Enemy one step along the flow field towards the Player, makes those close enough attack,
+        then moves their animations on, called once per tick
+        :param player_tile: The Tile the Player is on
+        :param field: A FlowField rooted at the Player's Tile
+        """
+        alive = np.flatnonzero(self.health[:self.count] > 0)
+        self.dx[alive] = 0
+        self.dy[alive] = 0
+        # Tiles were found after moving last tick, so only need finding again if the Room has changed since,
+        # or for new Enemies and ones moved by set_center()
+        stale = alive[self.tile_versions[alive] != rooms.LAYOUT_VERSION]
+        if len(stale):
+            self.update_tiles(stale)
+
+        # The next Tile towards the Player for every Enemy on a Tile that can reach them
+        on_tile = alive[self.tile_columns[alive] >= 0]
+        steps = field.get_steps(list(zip(self.tile_columns[on_tile].tolist(), self.tile_rows[on_tile].tolist())))
+        moving = np.array([step is not None for step in steps], bool)
+        if moving.any():
+            indices = on_tile[moving]
+            steps = np.array([step for step in steps if step is not None], np.int64)
+            # Enemies more than one Tile away from the Player move, the rest turn to attack
+            far = (np.abs(self.tile_columns[indices] - player_tile.get_column()) +
+                   np.abs(self.tile_rows[indices] - player_tile.get_row())) * rooms.TILE_SIZE > 75
+            near = indices[~far]
+            indices = indices[far]
+            steps = steps[far]
+
+            # Moves speed pixels from the centre of the hitbox towards the centre of the next Tile
+            dist_x = self.x[indices] + self.width[indices] // 2 - (steps[:, 0] * rooms.TILE_SIZE + rooms.TILE_SIZE // 2)
+            dist_y = self.y[indices] + self.height[indices] // 2 - (steps[:, 1] * rooms.TILE_SIZE + rooms.TILE_SIZE // 2)
+            scale_factor = self.speed[indices] / np.sqrt(dist_x ** 2 + dist_y ** 2)
+            x = round_half_away(self.x[indices] - dist_x * scale_factor)
+            y = round_half_away(self.y[indices] - dist_y * scale_factor)
+            self.dx[indices] = x - self.x[indices]
+            self.dy[indices] = y - self.y[indices]
+            self.x[indices] = x
+            self.y[indices] = y
+            self.state[indices] = np.where(dist_x > 0, MOVE_RIGHT, MOVE_LEFT)
+
+            self.state[near] = ATTACK_TURNS[self.state[near]]
+
+        spans = self.get_spans(alive)
+        self.update_tiles(alive, spans)
+
+        # Damage dealt to the Player lines up with the animation, Enemies attack at the start of it
+        # and on every tick that they are moving, as long as they are on a Tile next to the Player's
+        # Enemies pushed fully inside an obstacle have no Tile and can't attack until they are out again
+        if player_tile is not None:
+            states = self.state[alive]
+            frames = self.frames[alive, states]
+            columns = self.tile_columns[alive]
+            attacking = (frames == frames * self.frame_speeds[alive, states]) & (columns >= 0) & \
+                        ((np.abs(columns - player_tile.get_column()) +
+                          np.abs(self.tile_rows[alive] - player_tile.get_row())) * rooms.TILE_SIZE < 75)
+            # Always 5 unless rooms.SCALE_ENEMIES gave the Enemies another difficulty
+            for difficulty in self.difficulty[alive[attacking]].tolist():
+                system.PLAYER.hit(int(5 * difficulty))
+
+        # Only Enemies that have crossed a Tile boundary are moved in the spatial hash
+        moved = ~self.registered[alive] | (spans != self.grid_spans[alive]).any(axis=1)
+        for index, span in zip(alive[moved].tolist(), spans[moved].tolist()):
+            self.register(index, span)
+        self.animate(alive)
+
+    def hit(self, indices: list, damage: int):
+        """
+        Damages several Enemies at once, any that die drop their loot and are taken out of the spatial hash
+        :param indices: The indexes of the Enemies to damage, each Enemy must only be given once
+        :param damage: The amount of damage each Enemy takes
+        """
+        indices = np.asarray(indices, np.int64)
+        self.health[indices] -= damage
+        for index in indices[self.health[indices] <= 0].tolist():
+            kind = self.kinds[self.kind[index]]
+            drop = streams.get('loot').choice(list(kind.droppable.keys()))  # Picks a random item from droppables
+            tile = self.get_tile(index)
+            if drop == 'gold' and tile is not None:  # No Tile if the Enemy was knocked off the map
+                value = int(kind.droppable[drop] * self.difficulty[index])
+                tile.add_loot(items.Gold(value, int(self.x[index]), int(self.y[index])))
+            self.unregister(index)
+
+    def get_hitbox(self, index: int) -> pygame.Rect:
+        """
+        :param index: The Enemy's index
+        :return: A copy of the Enemy's hitbox
+        """
+        return pygame.Rect(int(self.x[index]), int(self.y[index]), int(self.width[index]), int(self.height[index]))
+
+    def set_center(self, index: int, x: int, y: int):
+        """
+        Moves an Enemy without changing its animation, the spatial hash catches up on the next update
+        :param index: The Enemy's index
+        :param x: x-coord for the centre of the hitbox
+        :param y: y-coord for the centre of the hitbox
+        """
+        self.x[index] = x - self.width[index] // 2
+        self.y[index] = y - self.height[index] // 2
+        self.tile_versions[index] = -1
+
+    def get_sprite(self, index: int) -> pygame.Surface:
+        """
+        :param index: The Enemy's index
+        :return: The current image of the Enemy's current animation
+        """
+        kind = self.kinds[self.kind[index]]
+        state = self.state[index]
+        sheet = self.sheets[(kind, kind.colours[self.colour[index]])][state]
+        return sheet.get_image(int(self.frames[index, state]))
+
+    def get_indices_in(self, rect: pygame.Rect) -> np.ndarray:
+        """
+        Only looks at the cells of the spatial hash the area covers, so the cost doesn't grow with the size of the Room
+        :param rect: The area to search, in pixels
+        :return: The indexes of every live Enemy whose hitbox touches the area, in the order they were added
+        """
+        span = rooms.get_tile_span(rect)
+        found = set()
+        for column in range(span[0], span[2] + 1):
+            for row in range(span[1], span[3] + 1):
+                cell = self.grid.get((column, row))
+                if cell:
+                    found.update(enemy.index for enemy in cell)
+        indices = np.array(sorted(found), np.int64)
+        x = self.x[indices]
+        y = self.y[indices]
+        touching = (self.health[indices] > 0) & (x < rect.right) & (x + self.width[indices] > rect.left) & \
+                   (y < rect.bottom) & (y + self.height[indices] > rect.top)
+        return indices[touching]
+
+    def get_sprites(self, rect: pygame.Rect, alpha: float) -> list:
+        """
+        Works out where every live Enemy whose hitbox touches an area is drawn, all at once
+        :param rect: The area to search, in pixels
+        :param alpha: How far through the current tick the frame being drawn is, from 0 to 1
+        :return: (sprite, sprite top left, under bar, health bar) for each Enemy in the order they were added,
+        positioned between the Enemy's last and current positions
+        """
+        indices = self.get_indices_in(rect)
+        x = self.x[indices]
+        y = self.y[indices]
+        states = self.state[indices]
+
+        # Moves the sprite back towards where it was at the start of the tick
+        x = x + np.round(-self.dx[indices] * (1 - alpha)).astype(np.int64)
+        y = y + np.round(-self.dy[indices] * (1 - alpha)).astype(np.int64)
+        offsets = self.sprite_offsets[self.kind[indices], states]
+        widths = HEALTH_BAR_SIZE[0] * (self.health[indices] / self.max_health[indices])
+
+        sprites = []
+        for index, sprite_x, sprite_y, bar_x, bar_y, width in zip(
+                indices.tolist(), (x + offsets[:, 0]).tolist(), (y + offsets[:, 1]).tolist(),
+                x.tolist(), (y - 20).tolist(), widths.tolist()):
+            sprites.append((self.get_sprite(index), (sprite_x, sprite_y),
+                            pygame.Rect((bar_x, bar_y), HEALTH_BAR_SIZE),
+                            pygame.Rect(bar_x, bar_y, width, HEALTH_BAR_SIZE[1])))
+        return sprites
+
+    def get_enemies_at(self, column: int, row: int) -> list:
+        """
+        :param column: The Tile's column
+        :param row: The Tile's row
+        :return: A list of all the live Enemies whose hitbox touches the Tile
+        """
+        return [enemy for enemy in self.grid.get((column, row), ()) if not enemy.is_dead()]
+
+    def get_living(self) -> list:
+        """
+        :return: A list of all the live Enemies, in the order they were added
+        """
+        return [self.enemies[index] for index in np.flatnonzero(self.health[:self.count] > 0).tolist()]
+
+    def is_clear(self) -> bool:
+        """
+        :return: True if every Enemy is dead
+        """
+        return not (self.health[:self.count] > 0).any()
@@ -1,69 +1,211 @@
-import pygame
 import os
+import random
+import pygame
+
+# Set NEA_HEADLESS=1 before importing to run the game logic with no window, used by headless.py
+HEADLESS = os.environ.get('NEA_HEADLESS') == '1'
+if HEADLESS:
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'  # Must be set before pygame.init() is called in gui
+SCREEN_SIZE = (1680, 1050)  # Size of the window in pixels, Rooms bigger than this scroll with the Player
+
+import assets
+import map
 import rooms
 import creatures
 import gui
+import profiler
+import snapshot
+import streams
 
+if HEADLESS:
+    WIN = None  # Nothing is drawn when headless
+else:
+    WIN = pygame.display.set_mode(SCREEN_SIZE, pygame.FULLSCREEN)  # Creats a window for the program to display to
 PLAYER = creatures.Player(70, 70)  # Creates an instance of the Player class for the user to control
-WIN = pygame.display.set_mode([1680, 1050], pygame.FULLSCREEN)  # Creats a window for the program to display to
 STATE = 'menu'  # Variable that controls what GUI should be displayed
+TICK_RATE = 20  # Number of game logic ticks per second, all speeds and cooldowns are measured in ticks
+MAX_FPS = 144  # Cap on the number of frames drawn per second, frames between ticks are interpolated
 
 
 class System:
-    def __init__(self):
+    def __init__(self, dirty_rects=False, room_size=None, save_path=None, recorder=None, seed=None):
         """
         Class to run the game itself and manage all the objects
+        :param dirty_rects: If True, only the parts of the screen that changed are redrawn and updated each frame
+        :param room_size: The number of (columns, rows) of Tiles in every Room, defaults to one screen
+        :param save_path: File the run is autosaved to and carried on from when the game starts,
+        runs aren't saved if not given
+        :param recorder: replay.Recorder that records the input of every new run, runs aren't recorded if not given
+        :param seed: Seed for the first new run, later runs and runs without one get a random seed
         """
         # Creates a surface that sprites can be drawn to
         self.clock = pygame.time.Clock()
-        # Loads the background image sprite and scales it to fit screen resolution
-        self.bg = pygame.transform.scale(pygame.image.load(
-            os.path.join('Sprites', 'Environment', 'Floor.png')).convert_alpha(), [1680, 1050])
+        if not HEADLESS:
+            assets.preload()  # Loads every other sprite now so that Room transitions don't have to
 
-        self.current_room = rooms.Room(1)  # The Room the Plyer is currently on
+        self.room_size = room_size or map.shape
+        self.save_path = save_path
+        self.load_error = None  # Why the saved run couldn't be carried on, shown on the main menu until Play is clicked
+        try:
+            state = snapshot.load(save_path) if save_path else None
+        except ValueError as error:
+            state = None
+            self.load_error = str(error)
+        self.unsaved_ticks = 0  # Ticks run since the last autosave
+        self.recorder = recorder
+        self.seed = seed  # Used up by the next call to new_run()
 
-    def new_run(self):
+        self.dirty_rects = dirty_rects
+        self.previous_rects = []  # Areas drawn to last frame, which have to be cleared this frame
+        self.full_redraw = True  # Forces the whole screen to be redrawn, e.g. after a menu or a new Room
+        self.last_state = None  # The STATE drawn on the last pass of the main loop, so menus know when to redraw
+        self.accumulator = 0  # Time in seconds that has passed but hasn't been simulated by a tick yet
+        self.profiler = profiler.Profiler()  # Times each phase of a frame, toggled on screen with F3
+        if state is not None:
+            try:
+                snapshot.restore(self, state)
+            except ValueError as error:
+                state = None
+                self.load_error = str(error)
+        self.resumed = state is not None  # If a saved run was loaded, Play carries it on instead of starting again
+        if state is None:
+            self.current_room = rooms.Room(1, size=self.room_size)  # The Room the Plyer is currently on
+            self.current_room.prefetch()  # Generates the next Room in the background
+
+    def new_run(self, seed=None):
         """
         Starts a new run for the Player
         Heals the Player to full health and resets the current_room to a Room of difficulty 1
+        :param seed: Seed for the run's random numbers, the same seed and input always play out the same way,
+        defaults to the seed given to __init__ for the first run and a random one after that
         """
-        self.current_room = rooms.Room(1)
+        if seed is None:
+            seed = self.seed if self.seed is not None else random.getrandbits(32)
+        self.seed = None
+        if self.recorder is not None:
+            self.recorder.start(self, seed)  # Before the run changes the Player
+        streams.seed(seed)
+        self.current_room = rooms.Room(1, size=self.room_size)
+        self.current_room.prefetch()
         PLAYER.heal(999)
+        if self.save_path:
+            snapshot.delete(self.save_path)  # The last run is over
+
+    def step(self, key):
+        """
+        Runs one tick of game logic, independent of how often the screen is drawn
+        :param key: The dictionary containing all button inputs for the tick, given by pygame
+        """
+        global STATE
+        if self.recorder is not None:
+            self.recorder.record_tick(key)
+        PLAYER.save_position()
+        PLAYER.move(key)  # Takes user input for movement and abilites
+        PLAYER.animate()
+        self.profiler.mark('input')
+        self.current_room.update()  # Moves all the Enemies
+        self.profiler.mark('enemy_ai')
+
+        if self.current_room.check_win():
+            if PLAYER.get_tile() == self.current_room.get_door():
+                # Moves on to next level if the Door is open
+                # The next Room was generated in the background, so it is swapped in straight away
+                self.current_room = self.current_room.next_room()
+                self.full_redraw = True
+
+        if PLAYER.is_dead():  # Changes to death screen if the Player dies
+            STATE = 'dead'
+        if self.recorder is not None:
+            self.recorder.check(self)
+
+    def attack(self):
+        """
+        Makes the Player do a basic attack, between ticks
+        """
+        if self.recorder is not None:
+            self.recorder.record_attack()
+        PLAYER.basic_attack()
+
+    def save(self):
+        """
+        Autosaves the run to save_path, the file is written in the background
+        """
+        snapshot.save(self, self.save_path)
+        self.unsaved_ticks = 0
+
+    def draw(self, alpha: float):
+        """
+        Draws the current Room and everything in it
+        :param alpha: How far through the current tick the frame is, from 0 to 1
+        """
+        # Keeps the Player in the middle of the screen, moving smoothly between ticks like the sprites do
+        offset = PLAYER.get_draw_offset(alpha)
+        self.current_room.camera.follow(PLAYER.get_hitbox().centerx + offset[0],
+                                        PLAYER.get_hitbox().centery + offset[1])
+
+        # Everything on screen moves when the Camera scrolls, so it all has to be redrawn
+        full_redraw = self.full_redraw or not self.dirty_rects or self.current_room.camera.has_moved()
+        self.full_redraw = False
+        if not full_redraw:
+            # Only clears the areas that were drawn to last frame
+            for rect in self.previous_rects:
+                self.current_room.draw_background(rect)
+        # self.current_room.draw_grid()
+        self.profiler.mark('background')
+
+        dirty = self.current_room.draw_obstacles(full_redraw)  # Draws the floor, obstacles and loot
+        self.profiler.mark('obstacles')
+        # self.current_room.draw_enemy_hitboxes()
+        dirty += self.current_room.draw_creatures(alpha)
+        # self.current_room.draw_grid()
+        # self.current_room.draw_player_hitbox()
+        self.profiler.mark('creatures')
+        dirty += self.current_room.draw_hud()
+        dirty += self.profiler.draw(WIN)
+        self.profiler.mark('hud')
+
+        if full_redraw:
+            pygame.display.update()
+        else:
+            pygame.display.update(self.previous_rects + dirty)
+        self.previous_rects = dirty
+        self.profiler.mark('display')
 
     def run(self):
         """
         Runs the game, using the current_room
         Draws to screen based on STATE global
         Commented code is debuggin functions
-        Contains the main game loop, operating at a set FPS
+        Contains the main game loop, which runs game logic at a fixed TICK_RATE
+        and draws as many frames as it can in between, up to MAX_FPS
         """
         global STATE
         while STATE != 'quit':
             if STATE == 'game_running':
+                if self.last_state != 'game_running':
+                    self.clock.tick()  # Time spent in menus isn't simulated
+                    self.accumulator = 0
+                    self.profiler.restart()
+                self.last_state = 'game_running'
 
-                WIN.blit(self.bg, (0, 0))
-                # self.current_room.draw_grid()
-
-                PLAYER.move(pygame.key.get_pressed())  # Takes user input for movement and abilites
-
-                rooms.draw_obstacles()  # Draws all obstacles in the Room to screen
-                # self.current_room.draw_enemy_hitboxes()
-                self.current_room.draw_creatures()
-                # self.current_room.draw_grid()
-                # self.current_room.draw_player_hitbox()
+                # Runs as many ticks as have built up since the last frame, capped so a long stall can't snowball
+                self.accumulator = min(self.accumulator + self.clock.tick(MAX_FPS) / 1000, 0.25)
+                self.profiler.mark('wait')
+                room = self.current_room
+                while self.accumulator >= 1 / TICK_RATE and STATE == 'game_running':
+                    self.accumulator -= 1 / TICK_RATE
+                    self.step(pygame.key.get_pressed())
+                    self.unsaved_ticks += 1
+                if STATE == 'dead' and self.recorder is not None:
+                    self.recorder.finish(self)
+                if self.save_path:
+                    if STATE == 'dead':
+                        snapshot.delete(self.save_path)
+                    elif self.current_room is not room or self.unsaved_ticks >= snapshot.AUTOSAVE_SECONDS * TICK_RATE:
+                        self.save()  # Copies the run here and writes it in the background
 
-                if self.current_room.check_win():
-                    if PLAYER.get_tile() == self.current_room.get_door():
-                        # Moves on to next level if the Door is open
-                        WIN.fill((0, 0, 0))
-                        pygame.display.update()
-                        pygame.time.delay(750)  # Small time delay before drawing new Room to prevent disorientation
-                        self.current_room = self.current_room.next_room()
-
-                if PLAYER.is_dead():  # Changes to death screen if the Player dies
-                    STATE = 'dead'
-
-                pygame.display.update()
+                if STATE == 'game_running':
+                    self.draw(self.accumulator * TICK_RATE)
 
                 for event in pygame.event.get():
                     if event.type == pygame.QUIT:
@@ -74,30 +216,46 @@ class System:
                         if event.key == pygame.K_ESCAPE:
                             # Pauses the program if escape key is pressed
                             STATE = 'game_paused'
+                        elif event.key == pygame.K_F3:
+                            self.profiler.toggle()
+                        elif event.key == pygame.K_F4:
+                            self.profiler.capture()  # Saves cProfile stats for the next PROFILE_FRAMES frames
 
                     if event.type == pygame.MOUSEBUTTONDOWN:
-                        PLAYER.basic_attack()
+                        self.attack()
+                self.profiler.mark('events')
+                self.profiler.end_frame()
 
-                pygame.time.Clock.tick(self.clock, 20)  # Caps FPS at a set amount
+                if STATE != 'game_running':
+                    self.full_redraw = True  # Menus draw over the whole screen, so it must be redrawn on return
+                    if STATE == 'game_paused' and self.save_path:
+                        self.save()
 
             # GUIS #
+            # Menus only redraw when they are first shown and wait for input instead of running at full speed
             elif STATE == 'game_paused':
 
-                gui.pause_menu()
-                pygame.display.update()
+                gui.pause_menu(self.last_state != STATE)
+                self.last_state = 'game_paused'
 
             elif STATE == 'menu':
 
-                gui.main_menu()
-                pygame.display.update()
+                gui.main_menu(self.last_state != STATE, self.load_error)
+                self.last_state = 'menu'
 
                 if STATE == 'game_running':
-                    self.new_run()
+                    if not self.resumed:
+                        self.new_run()
+                    self.resumed = False
+                    self.load_error = None
 
             elif STATE == 'dead':
 
-                gui.death_menu()
-                pygame.display.update()
+                gui.death_menu(self.last_state != STATE)
+                self.last_state = 'dead'
 
         # Saves all Player data when the game ends
         PLAYER.save_data()
+        if self.recorder is not None:
+            self.recorder.finish(self)  # Keeps the run recorded so far
+        snapshot.wait()  # Finishes writing the last autosave
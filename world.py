@@ -0,0 +1,348 @@
+import random
+import numpy as np
+import map
+import rooms
+import creatures
+import items
+
+CHUNK_SIZE = 16  # Width and height of every chunk, in Tiles
+MAX_CHUNKS = 64  # Memory budget, the most chunks of Tiles kept loaded at once, each holds CHUNK_SIZE ** 2 Tiles
+LOAD_RADIUS = 1  # Chunks up to this many chunks away from the Player's chunk are always loaded, covers the screen
+
+# The kind of each Tile, as stored in Chunk.kinds, rooms.TILE_CLASSES has the class for each
+FLOOR, BARREL, TRAP, DOOR = range(4)
+
+
+def get_chunk_key(column: int, row: int) -> tuple:
+    """
+    :param column: A Tile's column
+    :param row: A Tile's row
+    :return: The (column, row) of the chunk holding the Tile, counted in chunks
+    """
+    return column // CHUNK_SIZE, row // CHUNK_SIZE
+
+
+def get_keys_near(key: tuple, size: tuple) -> list:
+    """
+    :param key: The (column, row) of a chunk
+    :param size: The number of (columns, rows) of Tiles in the Room
+    :return: The keys of every chunk in the Room up to LOAD_RADIUS chunks away from the given one, in column order
+    """
+    columns = -(-size[0] // CHUNK_SIZE)  # Rounds up, the last chunk can be smaller
+    rows = -(-size[1] // CHUNK_SIZE)
+    return [(column, row)
+            for column in range(max(key[0] - LOAD_RADIUS, 0), min(key[0] + LOAD_RADIUS + 1, columns))
+            for row in range(max(key[1] - LOAD_RADIUS, 0), min(key[1] + LOAD_RADIUS + 1, rows))]
+
+
+def get_area(key: tuple, size: tuple) -> tuple:
+    """
+    :param key: The (column, row) of a chunk
+    :param size: The number of (columns, rows) of Tiles in the Room
+    :return: The Tiles the chunk covers, as (first column, first row, last column + 1, last row + 1)
+    """
+    return (key[0] * CHUNK_SIZE, key[1] * CHUNK_SIZE,
+            min((key[0] + 1) * CHUNK_SIZE, size[0]), min((key[1] + 1) * CHUNK_SIZE, size[1]))
+
+
+class ChunkLayout:
+    def __init__(self, seed: int, noise_seed: int, size: tuple, key: tuple, enemies: list, classes=None):
+        """
+        Class that holds where everything in one chunk goes, without making any Tiles or Enemies
+        Made only from the seeds and the chunk's position, so chunks can be made in any order
+        and are made the same again after being unloaded
+        :param seed: Seed for the random choices, such as which obstacles are Traps
+        :param noise_seed: Seed for the noise map, from 0 to 255
+        :param size: The number of (columns, rows) of Tiles in the Room
+        :param key: The (column, row) of the chunk, counted in chunks
+        :param enemies: The (column, row) of every Enemy in the chunk in column order, from Layout.get_enemies()
+        :param classes: The noise map for the whole Room if it has already been made, saves making the chunk's part
+        """
+        self.key = key
+        self.area = get_area(key, size)  # The Tiles the chunk covers
+        # FREE, OBSTACLE or ENEMY for every Tile
+        if classes is not None:
+            self.classes = classes[self.area[0]:self.area[2], self.area[1]:self.area[3]]
+        else:
+            self.classes = map.generate_area(noise_seed, size, self.area)
+        # Every chunk has its own random numbers, so it doesn't matter what order chunks are made in
+        rng = random.Random('{} {} {}'.format(seed, key[0], key[1]))
+
+        # FLOOR, BARREL or TRAP for every Tile, indexed [column - first column][row - first row]
+        self.kinds = np.where(self.classes == map.OBSTACLE, BARREL, FLOOR).astype(np.uint8)
+        for x, column in enumerate(self.classes.tolist()):
+            for y, value in enumerate(column):
+                if value == map.OBSTACLE and rng.randint(1, 10) == 1:  # 10% chance for a Barrel to become a Trap
+                    self.kinds[x, y] = TRAP
+
+        self.enemies = enemies
+
+
+class Chunk:
+    def __init__(self, world, layout, door: tuple):
+        """
+        Class that holds the Tiles of one chunk as flat arrays with one byte per Tile, rather than as objects
+        Tile objects are only made when asked for, as views of one place in the arrays
+        Bytearrays are used rather than numpy arrays as they are much faster to read one Tile at a time
+        :param world: The World the chunk is part of
+        :param layout: The chunk's ChunkLayout
+        :param door: The (column, row) of the Room's Door
+        """
+        self.world = world
+        self.area = layout.area
+        self.height = self.area[3] - self.area[1]
+        kinds = layout.kinds.copy()
+        if self.area[0] <= door[0] < self.area[2] and self.area[1] <= door[1] < self.area[3]:
+            kinds[door[0] - self.area[0], door[1] - self.area[1]] = DOOR
+        # Each array is indexed by get_index()
+        self.kinds = bytearray(kinds.tobytes())  # FLOOR, BARREL, TRAP or DOOR
+        self.occupied = bytearray((kinds == BARREL).astype(np.uint8).tobytes())  # 1 if the Tile blocks movement
+        self.states = bytearray(len(self.kinds))  # 1 once a Trap has been activated or a Door opened
+        self.loot = {}  # Maps the (column, row) of each Tile with loot on it to the list of items
+
+    def get_index(self, column: int, row: int) -> int:
+        """
+        :param column: The Tile's column in the Room
+        :param row: The Tile's row in the Room
+        :return: Where the Tile is in the chunk's arrays
+        """
+        return (column - self.area[0]) * self.height + row - self.area[1]
+
+    def get_state(self):
+        """
+        Used to save the chunk when it is unloaded
+        :return: Dict of everything in the chunk that changed during play, None if nothing has
+        """
+        occupied = bytes(np.frombuffer(self.kinds, np.uint8) == BARREL)
+        if not self.loot and not any(self.states) and self.occupied == occupied:
+            return None
+        return {
+            'occupied': bytes(self.occupied),
+            'states': bytes(self.states),
+            'loot': {coords: [(item.get_value(), *item.get_coords()) for item in loot]
+                     for coords, loot in self.loot.items()},
+        }
+
+
+class World:
+    def __init__(self, room, layout, max_chunks=None, state=None):
+        """
+        Class that holds the Tiles of a Room in chunks, which are only made when the Player gets close
+        Once more than max_chunks are loaded the chunks furthest from the Player are unloaded,
+        and any that changed during play are saved first so they come back the same
+        :param room: The Room the Tiles belong to
+        :param layout: The Room's Layout, which every chunk is made from
+        :param max_chunks: Most chunks kept loaded at once, defaults to MAX_CHUNKS
+        :param state: Dict from get_state() to load the same chunks as a saved run, none are loaded if not given
+        """
+        self.room = room
+        self.layout = layout
+        self.columns, self.rows = layout.size
+        self.max_chunks = max_chunks or MAX_CHUNKS
+        self.chunks = {}  # Maps the key of each loaded chunk to its Chunk
+        self.saved = {}  # Maps the key of each unloaded chunk that had changed to its state
+        self.spawned = set()  # Keys of every chunk whose Enemies have been added to the Room
+        self.pinned = {get_chunk_key(*layout.door)}  # Chunks that are never unloaded, the Door must always exist
+        self.centre = None  # Key of the chunk the Player was in at the last update
+        self.grid = None  # The result of get_grid(), rebuilt when rooms.LAYOUT_VERSION changes
+        self.grid_version = None
+
+        if state is not None:
+            self.saved = dict(state['saved'])
+            self.spawned = set(state['spawned'])
+            # Loaded in the same order as before, as which chunks are loaded decides where Enemies can go
+            for key in state['loaded']:
+                self.load(tuple(key))
+            self.centre = state['centre']
+
+    def make_tile(self, chunk: Chunk, column: int, row: int):
+        """
+        :param chunk: The Chunk holding the Tile
+        :param column: The Tile's column
+        :param row: The Tile's row
+        :return: A new view of the Tile, of the right class for its kind
+        """
+        return rooms.TILE_CLASSES[chunk.kinds[chunk.get_index(column, row)]](chunk, column, row)
+
+    def get_state(self) -> dict:
+        """
+        Used to save a run, holds only plain data so it can be written to a file
+        :return: Dict of the chunks that are loaded, the state of every chunk that changed during play
+        and which chunks have added their Enemies to the Room
+        """
+        saved = dict(self.saved)
+        for key, chunk in self.chunks.items():
+            state = chunk.get_state()
+            if state is not None:
+                saved[key] = state
+        return {
+            'loaded': list(self.chunks),
+            'saved': saved,
+            'spawned': sorted(self.spawned),
+            'centre': self.centre,
+        }
+
+    def get_unspawned(self) -> list:
+        """
+        The Room isn't clear until these have been spawned, found by the Player exploring, and killed
+        :return: The (column, row) of the first Enemy in every chunk whose Enemies haven't been added to the Room yet
+        """
+        return [coords for key, coords in self.layout.get_enemy_chunks().items() if key not in self.spawned]
+
+    def get_tile(self, column: int, row: int):
+        """
+        Loads the Tile's chunk if it isn't already loaded
+        :param column: The Tile's column
+        :param row: The Tile's row
+        :return: The Tile, None if it is outside the Room
+        """
+        if 0 <= column < self.columns and 0 <= row < self.rows:
+            key = (column // CHUNK_SIZE, row // CHUNK_SIZE)
+            chunk = self.chunks.get(key)
+            if chunk is None:
+                chunk = self.load(key)
+            return self.make_tile(chunk, column, row)
+        return None
+
+    def get_loaded(self, column: int, row: int):
+        """
+        Used by searches and far away Enemies, which shouldn't cause chunks to be loaded
+        :param column: The Tile's column
+        :param row: The Tile's row
+        :return: The Tile, None if it is outside the Room or its chunk isn't loaded
+        """
+        if 0 <= column < self.columns and 0 <= row < self.rows:
+            chunk = self.chunks.get((column // CHUNK_SIZE, row // CHUNK_SIZE))
+            if chunk is not None:
+                return self.make_tile(chunk, column, row)
+        return None
+
+    def get_loaded_kind(self, column: int, row: int):
+        """
+        Used when drawing, which shouldn't cause chunks to be loaded
+        :param column: The Tile's column
+        :param row: The Tile's row
+        :return: FLOOR, BARREL, TRAP or DOOR, None if it is outside the Room or its chunk isn't loaded
+        """
+        if 0 <= column < self.columns and 0 <= row < self.rows:
+            chunk = self.chunks.get((column // CHUNK_SIZE, row // CHUNK_SIZE))
+            if chunk is not None:
+                return chunk.kinds[chunk.get_index(column, row)]
+        return None
+
+    def get_occupied(self, column: int, row: int):
+        """
+        Reads the chunk's arrays directly, so searches don't have to make a Tile object for every Tile they visit
+        :param column: The Tile's column
+        :param row: The Tile's row
+        :return: 1 if the Tile blocks movement and 0 if not, None if it is outside the Room or its chunk isn't loaded
+        """
+        if 0 <= column < self.columns and 0 <= row < self.rows:
+            chunk = self.chunks.get((column // CHUNK_SIZE, row // CHUNK_SIZE))
+            if chunk is not None:
+                return chunk.occupied[(column - chunk.area[0]) * chunk.height + row - chunk.area[1]]
+        return None
+
+    def get_grid(self) -> tuple:
+        """
+        Used by searches that scan long lines of Tiles, which would be slow calling get_occupied for every Tile
+        The grid covers every loaded chunk with a border 1 Tile wide, so the Tiles around any Tile in it can be read
+        :return: (grid, column, row, height) where grid is a bytearray holding 1 for each Tile that blocks movement
+        or isn't loaded, and 0 for the rest. Tile (c, r) is at grid[(c - column) * height + r - row]
+        """
+        if self.grid_version != rooms.LAYOUT_VERSION:
+            areas = [chunk.area for chunk in self.chunks.values()]
+            column = min(area[0] for area in areas) - 1
+            row = min(area[1] for area in areas) - 1
+            height = max(area[3] for area in areas) + 1 - row
+            width = max(area[2] for area in areas) + 1 - column
+            grid = bytearray(b'\x01') * (width * height)
+            for chunk in self.chunks.values():
+                # Each column of a chunk is already stored in one run, the same as in the grid
+                for offset in range(chunk.area[2] - chunk.area[0]):
+                    start = (chunk.area[0] + offset - column) * height + chunk.area[1] - row
+                    grid[start:start + chunk.height] = chunk.occupied[offset * chunk.height:(offset + 1) * chunk.height]
+            self.grid = (grid, column, row, height)
+            self.grid_version = rooms.LAYOUT_VERSION
+        return self.grid
+
+    def get_loaded_tiles(self):
+        """
+        :return: Generator of every loaded Tile, a chunk at a time
+        """
+        for key in sorted(self.chunks):
+            chunk = self.chunks[key]
+            for column in range(chunk.area[0], chunk.area[2]):
+                for row in range(chunk.area[1], chunk.area[3]):
+                    yield self.make_tile(chunk, column, row)
+
+    def update(self, x: int, y: int):
+        """
+        Loads every chunk near the Player and unloads the furthest chunks if over budget, called once per tick
+        :param x: The Player's x-coord
+        :param y: The Player's y-coord
+        """
+        column = min(max(x // rooms.TILE_SIZE, 0), self.columns - 1)
+        row = min(max(y // rooms.TILE_SIZE, 0), self.rows - 1)
+        centre = get_chunk_key(column, row)
+        if centre == self.centre and len(self.chunks) <= self.max_chunks:
+            return  # Nothing to load or unload until the Player reaches another chunk
+        self.centre = centre
+
+        near = get_keys_near(centre, (self.columns, self.rows))
+        for key in near:
+            if key not in self.chunks:
+                self.load(key)
+
+        if len(self.chunks) > self.max_chunks:
+            keep = self.pinned.union(near)
+            far = [key for key in self.chunks if key not in keep]
+            far.sort(key=lambda key: max(abs(key[0] - centre[0]), abs(key[1] - centre[1])), reverse=True)
+            for key in far[:len(self.chunks) - self.max_chunks]:
+                self.unload(key)
+
+    def load(self, key: tuple) -> Chunk:
+        """
+        Makes the chunk from the Layout, then puts back anything that changed before it was unloaded
+        The chunk's Enemies are added to the Room the first time it is loaded
+        :param key: The (column, row) of the chunk, counted in chunks
+        :return: The new Chunk
+        """
+        layout = self.layout.get_chunk(key)
+        door = tuple(self.layout.door)
+        chunk = self.chunks[key] = Chunk(self, layout, door)
+        if chunk.area[0] <= door[0] < chunk.area[2] and chunk.area[1] <= door[1] < chunk.area[3]:
+            self.room.door = self.make_tile(chunk, *door)
+
+        state = self.saved.pop(key, None)
+        if state is not None:
+            chunk.occupied[:] = state['occupied']
+            chunk.states[:] = state['states']
+            for coords, loot in state['loot'].items():
+                tile = self.make_tile(chunk, *coords)
+                for value, x, y in loot:
+                    tile.add_loot(items.Gold(value, x, y))
+
+        # Adds Enemies to the Room
+        if key not in self.spawned:
+            self.spawned.add(key)
+            for coords in layout.enemies:
+                creatures.Factory('Slime', self.room.swarm, coords[0] * 70 + 35, coords[1] * 70 + 35,
+                                  self.room.difficulty if rooms.SCALE_ENEMIES else 1)
+
+        rooms.LAYOUT_VERSION += 1  # Tiles that used to be missing now exist, so paths have to be rebuilt
+        self.room.redraw_area(chunk.area)  # Blocks of background baked before the chunk existed don't have its sprites
+        return chunk
+
+    def unload(self, key: tuple):
+        """
+        Drops a chunk, saving anything in it that changed during play
+        :param key: The (column, row) of the chunk, counted in chunks
+        """
+        chunk = self.chunks.pop(key)
+        for coords in chunk.loot:
+            self.room.loot_tiles.pop(self.make_tile(chunk, *coords), None)
+        state = chunk.get_state()
+        if state is not None:
+            self.saved[key] = state
+        rooms.LAYOUT_VERSION += 1  # Tiles that were there are now missing